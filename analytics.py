@@ -0,0 +1,273 @@
+import io
+import os
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import pandas as pd
+
+from request_log import LOG_HEADER, LOG_PATH, segment_paths
+
+# largest number of parts returned by part_analytics
+MAX_PARTS = 500
+RESULT_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "128"))
+# how many refreshes back the parts each one added are remembered
+CHANGE_HISTORY = 64
+# the first load of a long log history can take a while
+ANALYTICS_TIMEOUT = float(os.getenv("ANALYTICS_TIMEOUT", "30"))
+NUMERIC_COLUMNS = ["min_price", "max_price", "avg_price", "final_price", "count"]
+
+
+def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], format="ISO8601", errors="coerce")
+    frame["part_number"] = frame["part_number"].astype(str)
+    for column in NUMERIC_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    return frame.dropna(subset=["timestamp"])
+
+
+class LogFile:
+    # Rows read so far from one log file. CSV files are tailed from the last
+    # complete line, so a growing file is never parsed twice.
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offset = 0
+        self.mtime = 0.0
+        self.frames: List[pd.DataFrame] = []
+        # frames[:merged] are already part of the LogStore frame; rewritten is
+        # set when rows it has merged were replaced or dropped
+        self.merged = 0
+        self.rewritten = False
+
+    def load(self, stat: os.stat_result) -> None:
+        if self.path.endswith(".parquet"):
+            if stat.st_mtime == self.mtime:
+                return
+            self.frames = [_typed(pd.read_parquet(self.path).reindex(columns=LOG_HEADER))]
+            self.mtime = stat.st_mtime
+            self.rewritten = True
+            return
+
+        if stat.st_size < self.offset:
+            # truncated or rewritten: start over
+            self.offset, self.frames = 0, []
+            self.rewritten = True
+        if stat.st_size == self.offset:
+            return
+        with open(self.path, "rb") as fp:
+            fp.seek(self.offset)
+            chunk = fp.read(stat.st_size - self.offset)
+        # a batch may be mid-write; only complete lines are consumed
+        end = chunk.rfind(b"\n") + 1
+        if not end:
+            return
+        header = 0 if self.offset == 0 else None
+        # part numbers stay strings: a tail of numeric parts would otherwise be
+        # read as integers and lose its leading zeros
+        frame = pd.read_csv(
+            io.BytesIO(chunk[:end]),
+            header=header,
+            names=None if header == 0 else LOG_HEADER,
+            dtype={"part_number": str},
+        )
+        self.offset += end
+        if frame.empty:
+            return
+        self.frames.append(_typed(frame.reindex(columns=LOG_HEADER)))
+
+
+class LogStore:
+    # Columnar view of the request log across the active file and its rotated
+    # segments. Files are tracked by inode, so the active file keeps its rows
+    # when rotation renames it, and a segment converted to Parquet replaces
+    # the CSV it came from.
+    #
+    # Rows appended since the last refresh are merged into the sorted frame
+    # rather than rebuilding it; only removed or rewritten files force a full
+    # rebuild. changes records, per version, the parts its new rows belong to
+    # (None after a rebuild) so cached results for other parts can be kept.
+
+    def __init__(self, path: str = LOG_PATH) -> None:
+        self.path = path
+        self.version = 0
+        self._files: Dict[Tuple[int, int], LogFile] = {}
+        self._frame: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+        self.changes: Dict[int, Optional[FrozenSet[str]]] = {}
+
+    def refresh(self) -> Tuple[int, pd.DataFrame]:
+        with self._lock:
+            seen = set()
+            for path in segment_paths(self.path) + [self.path]:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                key = (stat.st_dev, stat.st_ino)
+                seen.add(key)
+                log_file = self._files.get(key)
+                if log_file is None:
+                    log_file = self._files[key] = LogFile(path)
+                log_file.path = path
+                log_file.load(stat)
+            removed = set(self._files) - seen
+            for key in removed:
+                del self._files[key]
+            if self._frame is None or removed or any(log_file.rewritten for log_file in self._files.values()):
+                self._rebuild()
+            else:
+                new = [frame for log_file in self._files.values() for frame in log_file.frames[log_file.merged :]]
+                if new:
+                    self._append(pd.concat(new, ignore_index=True))
+            for log_file in self._files.values():
+                log_file.merged, log_file.rewritten = len(log_file.frames), False
+            return self.version, self._frame
+
+    def _rebuild(self) -> None:
+        frames = [frame for log_file in self._files.values() for frame in log_file.frames]
+        if frames:
+            combined = pd.concat(frames, ignore_index=True)
+        else:
+            combined = _typed(pd.DataFrame(columns=LOG_HEADER))
+        combined = combined.sort_values("timestamp", kind="stable", ignore_index=True)
+        # parts are factorized once per load rather than on every groupby
+        combined["part_number"] = combined["part_number"].astype("category")
+        self._bump(combined, None)
+
+    def _append(self, rows: pd.DataFrame) -> None:
+        frame = self._frame
+        rows = rows.sort_values("timestamp", kind="stable", ignore_index=True)
+        parts = rows["part_number"]
+        categories = frame["part_number"].cat.categories
+        added = pd.Index(parts.unique()).difference(categories)
+        if len(added):
+            frame = frame.assign(part_number=frame["part_number"].cat.add_categories(added))
+            categories = frame["part_number"].cat.categories
+        rows["part_number"] = pd.Categorical(parts, categories=categories)
+        # rows from several workers' batches may interleave; only the tail of
+        # the frame they reach back into is sorted again
+        start = int(frame["timestamp"].searchsorted(rows["timestamp"].iloc[0], side="right"))
+        if start < len(frame):
+            rows = pd.concat([frame.iloc[start:], rows], ignore_index=True)
+            rows = rows.sort_values("timestamp", kind="stable", ignore_index=True)
+        combined = pd.concat([frame.iloc[:start], rows], ignore_index=True)
+        self._bump(combined, frozenset(parts.unique()))
+
+    def _bump(self, frame: pd.DataFrame, parts: Optional[FrozenSet[str]]) -> None:
+        self._frame = frame
+        self.version += 1
+        self.changes[self.version] = parts
+        self.changes.pop(self.version - CHANGE_HISTORY, None)
+
+    def changed_parts(self, since: int, until: int) -> Optional[FrozenSet[str]]:
+        # parts with new rows between the two versions; None if unknown or
+        # everything may have changed
+        changed: FrozenSet[str] = frozenset()
+        for version in range(since + 1, until + 1):
+            parts = self.changes.get(version)
+            if parts is None:
+                return None
+            changed |= parts
+        return changed
+
+
+_store = LogStore()
+_results: Dict[Tuple, Dict] = {}
+_results_version = 0
+_results_lock = threading.Lock()
+
+
+def _trend_per_day(frame: pd.DataFrame) -> pd.Series:
+    # least-squares slope of final_price over time, per part, from group sums
+    x = (frame["timestamp"] - frame["timestamp"].min()).dt.total_seconds() / 86400.0
+    y = frame["final_price"]
+    valid = y.notna()
+    sums = pd.DataFrame(
+        {"part_number": frame["part_number"][valid], "x": x[valid], "y": y[valid]}
+    ).assign(xy=lambda f: f.x * f.y, xx=lambda f: f.x * f.x)
+    grouped = sums.groupby("part_number", observed=True).agg(
+        n=("x", "size"), sx=("x", "sum"), sy=("y", "sum"), sxy=("xy", "sum"), sxx=("xx", "sum")
+    )
+    denominator = grouped.n * grouped.sxx - grouped.sx ** 2
+    return (grouped.n * grouped.sxy - grouped.sx * grouped.sy) / denominator.where(denominator > 1e-12)
+
+
+def _part_analytics(frame: pd.DataFrame, part: Optional[str], window: str, days: Optional[int], limit: int) -> Dict:
+    if days:
+        since = pd.Timestamp.now(tz="UTC").tz_localize(None) - pd.Timedelta(days=days)
+        frame = frame[frame["timestamp"] >= since]
+    if part:
+        frame = frame[frame["part_number"] == part]
+    if frame.empty:
+        return {"rows": 0, "window": window, "parts": [], "daily_requests": {}}
+
+    grouped = frame.groupby("part_number", sort=False, observed=True)
+    summary = grouped.agg(
+        requests=("timestamp", "size"),
+        first_seen=("timestamp", "min"),
+        last_seen=("timestamp", "max"),
+        last_final_price=("final_price", "last"),
+    )
+    # rolling statistics over the trailing window, read at each part's latest
+    # request: the same (last - window, last] span pandas' rolling() uses
+    latest = frame.groupby("part_number", sort=False, observed=True)["timestamp"].transform("max")
+    window_start = latest - pd.Timedelta(window)
+    rolling = (
+        frame[frame["timestamp"] > window_start]
+        .groupby("part_number", sort=False, observed=True)
+        .agg(min_price=("min_price", "min"), avg_price=("avg_price", "mean"), max_price=("max_price", "max"))
+    )
+    summary = summary.join(rolling).join(_trend_per_day(frame).rename("trend_per_day"))
+    summary = summary.sort_values(["requests", "last_seen"], ascending=False).head(limit)
+
+    summary["first_seen"] = summary["first_seen"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    summary["last_seen"] = summary["last_seen"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    summary = summary.round(2).astype(object).where(summary.notna(), None)
+    daily = frame.groupby(frame["timestamp"].dt.floor("D")).size()
+    return {
+        "rows": int(len(frame)),
+        "window": window,
+        "parts": summary.reset_index().to_dict(orient="records"),
+        "daily_requests": {day.strftime("%Y-%m-%d"): int(count) for day, count in daily.items()},
+    }
+
+
+def part_demand(days: Optional[int] = None, limit: int = MAX_PARTS) -> List[Tuple[str, int]]:
+    # (part_number, requests) over the last `days`, busiest first
+    _, frame = _store.refresh()
+    if days:
+        since = pd.Timestamp.now(tz="UTC").tz_localize(None) - pd.Timedelta(days=days)
+        frame = frame[frame["timestamp"] >= since]
+    counts = frame["part_number"].value_counts(sort=True)
+    return [(str(part), int(count)) for part, count in counts.head(limit).items() if count]
+
+
+def part_analytics(
+    part: Optional[str] = None, window: str = "7D", days: Optional[int] = None, limit: int = 50
+) -> Dict:
+    global _results_version
+    pd.Timedelta(window)  # ValueError on a bad window
+    limit = max(1, min(limit, MAX_PARTS))
+    version, frame = _store.refresh()
+    key = (part, window, days, limit)
+    with _results_lock:
+        # new rows only invalidate the results they can change: those for
+        # their parts and those over all parts
+        if version > _results_version:
+            changed = _store.changed_parts(_results_version, version)
+            if changed is None:
+                _results.clear()
+            else:
+                for stale in [k for k in _results if k[0] is None or k[0] in changed]:
+                    del _results[stale]
+            _results_version = version
+        cached = _results.get(key) if version == _results_version else None
+    if cached is not None:
+        return cached
+    result = _part_analytics(frame, part, window, days, limit)
+    with _results_lock:
+        if version == _results_version:
+            if len(_results) >= RESULT_CACHE_SIZE:
+                _results.pop(next(iter(_results)))
+            _results[key] = result
+    return result
@@ -0,0 +1,113 @@
+"""Time the analytics refresh after a few rows are appended to a large log.
+
+Run from the repository root:
+
+    python benchmarks/bench_analytics.py [--rows N] [--parts P]
+
+A request log of N rows over P parts is written to a temporary directory
+and loaded once. Single rows are then appended, one in order and one that
+reaches back into the loaded rows, and each refresh is timed. The merged
+frame must match a fresh load of the same file, and only the cached results
+for the appended part (and for all parts) may be dropped.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+from request_log import LOG_HEADER  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def write_log(path: str, rows: int, parts: int) -> None:
+    rng = np.random.default_rng(7)
+    prices = rng.uniform(20, 400, rows).round(2)
+    frame = pd.DataFrame(
+        {
+            "timestamp": [(START + timedelta(seconds=2 * i)).isoformat() for i in range(rows)],
+            "part_number": [f"{n:08d}" for n in rng.integers(0, parts, rows)],
+            "min_price": prices,
+            "max_price": prices * 1.5,
+            "avg_price": prices * 1.2,
+            "final_price": prices * 1.62,
+            "count": rng.integers(1, 30, rows),
+        },
+        columns=LOG_HEADER,
+    )
+    frame.to_csv(path, index=False)
+
+
+def append_row(path: str, timestamp: datetime, part: str) -> None:
+    with open(path, "a", newline="") as fp:
+        csv.writer(fp).writerow([timestamp.isoformat(), part, 10.0, 20.0, 15.0, 20.25, 2])
+
+
+def comparable(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.assign(part_number=frame["part_number"].astype(str))
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run(rows: int, parts: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "requests_log.csv")
+        write_log(path, rows, parts)
+        store = analytics._store = analytics.LogStore(path)
+        _, elapsed = timed(store.refresh)
+        print(f"{rows} rows: first load {elapsed:.2f} s")
+
+        touched, untouched = "00000001", "00000002"
+        kept = analytics.part_analytics(untouched)
+        analytics.part_analytics(touched)
+        analytics.part_analytics()
+
+        appended = [
+            ("in order", START + timedelta(seconds=2 * rows)),
+            ("out of order", START + timedelta(seconds=2 * (rows - 100) + 1)),
+        ]
+        for label, timestamp in appended:
+            append_row(path, timestamp, touched)
+            _, elapsed = timed(store.refresh)
+            print(f"refresh after 1 row {label}: {elapsed * 1000:.1f} ms")
+        _, elapsed = timed(lambda: analytics.part_analytics(untouched))
+        print(f"cached query for another part: {elapsed * 1000:.2f} ms")
+        result, elapsed = timed(lambda: analytics.part_analytics(touched))
+        print(f"query for the appended part: {elapsed * 1000:.1f} ms")
+
+        if analytics.part_analytics(untouched) is not kept:
+            raise SystemExit("a result for a part without new rows was dropped")
+        if result["parts"][0]["requests"] != analytics._part_analytics(
+            store.refresh()[1], touched, "7D", None, 50
+        )["parts"][0]["requests"]:
+            raise SystemExit("the appended part was served from a stale result")
+        _, merged = store.refresh()
+        _, fresh = analytics.LogStore(path).refresh()
+        pd.testing.assert_frame_equal(comparable(merged), comparable(fresh))
+        print("merged frame matches a fresh load")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--parts", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.rows, args.parts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Check SingleFlight coalescing and time a burst of identical calls.
+
+Run from the repository root:
+
+    python benchmarks/bench_coalescing.py [--callers N] [--latency S]
+
+N concurrent callers ask for the same key while the work sleeps for S
+seconds. The work must run once and every caller get its result. The
+cancellation rules are checked as well: the last waiter being cancelled
+cancels the work, a caller arriving right after that starts a fresh flight
+instead of inheriting the cancellation, and a cancelled joiner leaves the
+flight running for the others.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singleflight import SingleFlight  # noqa: E402
+
+
+class Work:
+    # counts how often the shared work actually runs
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self.calls
+
+
+async def check_burst(callers: int, latency: float) -> float:
+    flights, work = SingleFlight(), Work(latency)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(flights.do("part", work) for _ in range(callers)))
+    elapsed = time.perf_counter() - start
+    if work.calls != 1 or set(results) != {1}:
+        raise SystemExit(f"burst: work ran {work.calls} times, results {set(results)}")
+    return elapsed
+
+
+async def check_late_joiner(latency: float) -> None:
+    # the only waiter is cancelled; a caller arriving before the cancelled
+    # task has finished must not receive that cancellation
+    flights, work = SingleFlight(), Work(latency)
+    first = asyncio.create_task(flights.do("part", work))
+    await asyncio.sleep(latency / 10)
+    first.cancel()
+    await asyncio.sleep(0)
+    try:
+        result = await flights.do("part", work)
+    except asyncio.CancelledError:
+        raise SystemExit("late joiner: inherited the cancelled flight") from None
+    if work.calls != 2 or result != 2:
+        raise SystemExit(f"late joiner: work ran {work.calls} times, result {result}")
+    await asyncio.gather(first, return_exceptions=True)
+
+
+async def check_cancelled_joiner(latency: float) -> None:
+    flights, work = SingleFlight(), Work(latency)
+    keeper = asyncio.create_task(flights.do("part", work))
+    leaver = asyncio.create_task(flights.do("part", work))
+    await asyncio.sleep(latency / 10)
+    leaver.cancel()
+    if await keeper != 1 or work.calls != 1:
+        raise SystemExit("cancelled joiner: the shared flight did not survive")
+    await asyncio.gather(leaver, return_exceptions=True)
+
+
+async def run(callers: int, latency: float) -> None:
+    elapsed = await check_burst(callers, latency)
+    await check_late_joiner(latency)
+    await check_cancelled_joiner(latency)
+    print(f"{callers} callers, 1 run of {latency * 1000:.0f} ms work, {elapsed * 1000:.1f} ms in total")
+    print("cancellation checks passed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.callers, args.latency))
+
+
+if __name__ == "__main__":
+    main()
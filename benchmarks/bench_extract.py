@@ -0,0 +1,129 @@
+"""Compare the single-pass OEM extractor with the per-pattern findall scans.
+
+Run from the repository root:
+
+    python benchmarks/bench_extract.py [--rounds N]
+
+The saved pages in fixtures/ (raw HTML and visible text, alone and
+concatenated into one large dump) plus random fuzz strings are run through
+both implementations and the streaming scanner, the outputs are checked for
+equality, and the mean time per blob is reported.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from listing_parser import element_text, parse_html  # noqa: E402
+from oem_extractor import (  # noqa: E402
+    OEM_REGEX,
+    PREFIX_HINT_PATTERNS,
+    classify,
+    extract_oems,
+    group_by_tag,
+    scan,
+    scan_chunks,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# ----------------------------- Reference -----------------------------
+
+
+def findall_extract(text: str) -> List[str]:
+    # what oem_resolver.extract_oems_from_text did: one scan per pattern
+    results = OEM_REGEX.findall(text)
+    for pattern in PREFIX_HINT_PATTERNS:
+        results.extend(pattern.findall(text))
+    return results
+
+
+def load_blobs() -> List[Tuple[str, str]]:
+    blobs: List[Tuple[str, str]] = []
+    for name in sorted(os.listdir(FIXTURES)):
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as fp:
+            html = fp.read()
+        blobs.append((f"{name} html", html))
+        blobs.append((f"{name} text", element_text(parse_html(html))))
+    blobs.append(("all pages x20", " ".join(text for _, text in blobs) * 20))
+    return blobs
+
+
+def fuzz_strings(count: int, rng: random.Random) -> List[str]:
+    # digits, letters, separators and the non-ASCII characters that \d, \w
+    # and IGNORECASE treat specially
+    alphabet = "0123456789" * 4 + "ABHKLSabhkls" + " -_/.:" + "٣Kſéİ"
+    tokens = ["11657649288", "06H145702S", "8K0907551", "9801234567", "3112", "0445110328", "2015"]
+    strings = []
+    for _ in range(count):
+        parts = [
+            rng.choice(tokens) if rng.random() < 0.3 else "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 14)))
+            for _ in range(rng.randint(1, 12))
+        ]
+        strings.append("".join(part + rng.choice(["", " ", "-", "_", "\n"]) for part in parts))
+    return strings
+
+
+def random_chunks(text: str, rng: random.Random) -> List[str]:
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text), rng.randint(0, 40))))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+def check(texts: List[str], rng: random.Random) -> None:
+    for text in texts:
+        expected = findall_extract(text)
+        actual = extract_oems(text)
+        if actual != expected:
+            raise SystemExit(f"outputs differ for {text[:80]!r}\nfindall: {expected[:20]}\nsingle:  {actual[:20]}")
+        chunks = random_chunks(text, rng)
+        streamed = list(scan_chunks(chunks))
+        if streamed != list(scan(text)):
+            raise SystemExit(f"streamed scan differs for {len(chunks)} chunks of {text[:80]!r}")
+        grouped = group_by_tag(streamed)
+        if [token for tokens in grouped.values() for token in tokens] != expected:
+            raise SystemExit(f"streamed grouping differs for {text[:80]!r}")
+
+
+# ----------------------------- Timing -----------------------------
+
+
+def timed(func: Callable[[], object], rounds: int, cold: bool = False) -> float:
+    total = 0.0
+    for _ in range(rounds):
+        if cold:
+            classify.cache_clear()
+        start = time.perf_counter()
+        func()
+        total += time.perf_counter() - start
+    return total / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    blobs = load_blobs()
+    check([text for _, text in blobs] + fuzz_strings(5000, rng), rng)
+    print("outputs match on every blob, fuzz string and chunking")
+
+    print(f"{'blob':<32}{'KB':>7}{'findall ms':>12}{'cold ms':>10}{'warm ms':>10}{'speedup':>10}")
+    for label, text in blobs:
+        reference = timed(lambda: findall_extract(text), args.rounds)
+        cold = timed(lambda: extract_oems(text), args.rounds, cold=True)
+        warm = timed(lambda: extract_oems(text), args.rounds)
+        print(
+            f"{label:<32}{len(text) / 1024:>7.0f}{reference * 1000:>12.2f}{cold * 1000:>10.2f}"
+            f"{warm * 1000:>10.2f}{reference / warm:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the compiled lookup index with the per-call lookup_from_table scan.
+
+Run from the repository root:
+
+    python benchmarks/bench_lookup.py [--rounds N]
+
+Every (car, model, detail) query is resolved by both implementations, the
+results are checked for equality, and the mean time per query is reported,
+cold (fresh index) and warm (memoized).
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from oem_resolver import CATALOG_DATA, LOOKUP_DATA, LookupIndex, lookup_from_table  # noqa: E402
+
+Query = Tuple[str, str, str]
+
+
+def build_queries(table: Dict) -> List[Query]:
+    # exact keys plus the sloppy spellings users type into the search box
+    queries: List[Query] = []
+    for car, models in table.items():
+        for model, details in models.items():
+            for detail in details:
+                queries.append((car, model, detail))
+                queries.append((car.lower(), model.lower(), detail.upper()))
+                queries.append((car[:3], f"{model} facelift", detail[:-1]))
+                queries.append((car, model, "unknown part"))
+    return queries
+
+
+def timed(func: Callable[[], object], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'table':<18}{'queries':>8}{'scan us':>10}{'cold us':>10}{'warm us':>10}")
+    for label, table in (("oem_lookup.json", LOOKUP_DATA), ("oem_catalog.json", CATALOG_DATA)):
+        queries = build_queries(table)
+        index = LookupIndex(table)
+        for query in queries:
+            expected = lookup_from_table(*query, table)
+            actual = index.lookup(*query)
+            if expected != actual:
+                raise SystemExit(f"{label} {query}: results differ\nscan:  {expected}\nindex: {actual}")
+
+        scan = timed(lambda: [lookup_from_table(*query, table) for query in queries], args.rounds)
+        cold_index = LookupIndex(table)
+        cold = timed(lambda: [cold_index._resolve(*query) for query in queries], args.rounds)
+        warm = timed(lambda: [index.lookup(*query) for query in queries], args.rounds)
+        per_query = 1e6 / len(queries)
+        print(f"{label:<18}{len(queries):>8}{scan * per_query:>10.1f}{cold * per_query:>10.1f}{warm * per_query:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Compare the lxml listing parser with the previous BeautifulSoup parsing.
+
+Run from the repository root:
+
+    python benchmarks/bench_parsing.py [--rounds N]
+
+Every fixture is parsed by both implementations, the outputs are checked for
+equality, and the mean time per page is reported.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from listing_parser import (  # noqa: E402
+    clean_price_text,
+    parse_ebay_listings,
+    parse_rrr_detail,
+    parse_rrr_listings,
+)
+
+# the OEM filter the BeautifulSoup scrapers applied
+OEM_PATTERN = re.compile(r"\b\d{5,12}\b")
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# ----------------------------- BeautifulSoup reference -----------------------------
+
+def bs4_parse_item(item: BeautifulSoup, base_url: str) -> Optional[Dict]:
+    title_elem = item.select_one(".item-title, .title, [itemprop='name'], .part-name a, a.title")
+    price_elem = item.select_one(".price, .item-price, .search-item-price, span[itemprop='price']")
+    image_elem = item.select_one("[itemprop='image'], img")
+    link_elem = item.select_one("[itemprop='url'], a[href*='autodalis'], .part-name a, a")
+
+    price = clean_price_text(price_elem.get_text(" ", strip=True)) if price_elem else None
+    if price is None:
+        return None
+    link_href = link_elem.get("href") if link_elem else None
+    link = urljoin(base_url, link_href) if link_href else None
+    image = image_elem.get("src") if image_elem else None
+    title = title_elem.get_text(" ", strip=True) if title_elem else None
+    return {"title": title, "price": price, "image": image, "link": link}
+
+
+def bs4_rrr_listings(html: str, target_oem: Optional[str] = None) -> List[Dict]:
+    soup = BeautifulSoup(html, "lxml")
+    containers = soup.select(".search-item, .item, .item-block, .items-box")
+    if not containers:
+        containers = soup.select("article, li, div")
+    results: List[Dict] = []
+    for item in containers:
+        item_text = item.get_text(" ", strip=True)
+        if target_oem and target_oem not in item_text:
+            if target_oem not in OEM_PATTERN.findall(item_text):
+                continue
+        parsed = bs4_parse_item(item, "https://rrr.lt")
+        if parsed:
+            results.append(parsed)
+    return results
+
+
+def bs4_rrr_detail(html: str, link: str, target_oem: Optional[str]) -> Optional[Dict]:
+    soup = BeautifulSoup(html, "lxml")
+    text_blob = soup.get_text(" ", strip=True)
+    if target_oem and target_oem not in text_blob:
+        if target_oem not in OEM_PATTERN.findall(text_blob):
+            return None
+    price_elem = soup.select_one(".price, .item-price, .search-item-price, span[itemprop='price']")
+    price = clean_price_text(price_elem.get_text(" ", strip=True)) if price_elem else None
+    image_elem = soup.select_one("[itemprop='image'], img")
+    image = image_elem.get("src") if image_elem else None
+    if price:
+        return {"title": None, "price": price, "image": image, "link": link}
+    return None
+
+
+def bs4_ebay_listings(html: str) -> List[Dict]:
+    soup = BeautifulSoup(html, "lxml")
+    results: List[Dict] = []
+    for item in soup.select(".s-item"):
+        price_elem = item.select_one(".s-item__price, span[itemprop='price']")
+        price = clean_price_text(price_elem.get_text(" ", strip=True)) if price_elem else None
+        if price is None:
+            continue
+        image_elem = item.select_one(".s-item__image-img")
+        link_elem = item.select_one(".s-item__link")
+        link = link_elem.get("href") if link_elem else None
+        image = image_elem.get("src") if image_elem else None
+        results.append({"title": None, "price": price, "image": image, "link": link})
+    return results
+
+
+# ----------------------------- Runner -----------------------------
+
+def load(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as fp:
+        return fp.read()
+
+
+def timed(func: Callable[[], object], rounds: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    detail_link = "https://rrr.lt/autodalis/1000"
+    cases = [
+        ("rrr search", "rrr_search.html", bs4_rrr_listings, parse_rrr_listings, ("11657649288",)),
+        ("rrr search, no OEM filter", "rrr_search.html", bs4_rrr_listings, parse_rrr_listings, ()),
+        ("rrr search, div fallback", "rrr_search_fallback.html", bs4_rrr_listings, parse_rrr_listings, ("11657649288",)),
+        ("rrr detail", "rrr_detail.html", bs4_rrr_detail, parse_rrr_detail, (detail_link, "11657649288")),
+        ("ebay search", "ebay_search.html", bs4_ebay_listings, parse_ebay_listings, ()),
+    ]
+
+    print(f"{'case':<28}{'bs4 ms':>10}{'lxml ms':>10}{'speedup':>10}")
+    for label, fixture, reference, candidate, extra in cases:
+        html = load(fixture)
+        expected = reference(html, *extra)
+        actual = candidate(html, *extra)
+        if expected != actual:
+            raise SystemExit(f"{label}: outputs differ\nbs4:  {expected}\nlxml: {actual}")
+        bs4_time = timed(lambda: reference(html, *extra), args.rounds)
+        lxml_time = timed(lambda: candidate(html, *extra), args.rounds)
+        print(f"{label:<28}{bs4_time * 1000:>10.2f}{lxml_time * 1000:>10.2f}{bs4_time / lxml_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
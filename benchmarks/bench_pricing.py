@@ -0,0 +1,147 @@
+"""Check the vectorized pricing engine against per-OEM reference code and time it.
+
+Run from the repository root:
+
+    python benchmarks/bench_pricing.py [--oems N] [--rounds N]
+
+Every method is first checked against a straightforward per-group
+implementation on random price lists (with outliers, empty lists, invalid
+prices and source weights), then timed over N OEMs in one batch against
+pricing each OEM separately.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pricing  # noqa: E402
+from pricing import IQR_FACTOR, METHODS, TRIM_FRACTION, aggregate_groups, quote_price  # noqa: E402
+
+# ----------------------------- Per-group reference -----------------------------
+
+
+def reference(prices: Sequence[float], weights: Optional[Sequence[float]], method: str) -> float:
+    pairs = sorted(
+        (p, w)
+        for p, w in zip(prices, weights or [1.0] * len(prices))
+        if np.isfinite(p) and p > 0 and np.isfinite(w) and w > 0
+    )
+    if not pairs:
+        return float("nan")
+    values = np.array([p for p, _ in pairs])
+    w = np.array([w for _, w in pairs])
+
+    if method == "median":
+        cumulative = np.cumsum(w)
+        half = w.sum() / 2
+        lower = values[np.argmax(cumulative >= half - 1e-9 * half)]
+        upper = values[np.argmax(cumulative > half + 1e-9 * half)]
+        return (lower + upper) / 2
+    if method == "iqr":
+        q1, q3 = np.percentile(values, [25, 75])
+        spread = IQR_FACTOR * (q3 - q1)
+        keep = (values >= q1 - spread) & (values <= q3 + spread)
+    elif method == "trimmed":
+        cut = int(len(values) * TRIM_FRACTION)
+        keep = np.zeros(len(values), dtype=bool)
+        keep[cut:len(values) - cut] = True
+    else:
+        keep = np.ones(len(values), dtype=bool)
+    return float((values[keep] * w[keep]).sum() / w[keep].sum())
+
+
+def random_groups(count: int, rng: random.Random, weighted: bool):
+    groups: List[List[float]] = []
+    weights: List[List[float]] = []
+    for _ in range(count):
+        size = rng.choice([0, 1, 2, 3, 5, 8, 20, 60])
+        base = rng.uniform(20, 900)
+        prices = [round(rng.gauss(base, base * 0.15), 2) for _ in range(size)]
+        for index in range(size):
+            roll = rng.random()
+            if roll < 0.05:
+                prices[index] *= 1000  # thousands-separator mis-parse
+            elif roll < 0.07:
+                prices[index] = rng.choice([0.0, -1.0, float("nan")])
+        # ties exercise the median tie-breaking
+        if size > 3 and rng.random() < 0.3:
+            prices[1] = prices[2]
+        groups.append(prices)
+        weights.append([rng.choice([0.5, 1.0, 2.0]) for _ in range(size)] if weighted else [1.0] * size)
+    return groups, weights
+
+
+def check(rng: random.Random) -> None:
+    for weighted in (False, True):
+        groups, weights = random_groups(3000, rng, weighted)
+        for method in METHODS:
+            actual, _ = aggregate_groups(groups, weights, method)
+            expected = np.array([reference(g, w, method) for g, w in zip(groups, weights)])
+            if not np.allclose(actual, expected, equal_nan=True, rtol=1e-9, atol=1e-9):
+                bad = int(np.flatnonzero(~np.isclose(actual, expected, equal_nan=True))[0])
+                raise SystemExit(
+                    f"{method} (weighted={weighted}) differs for {groups[bad]}: {actual[bad]} != {expected[bad]}"
+                )
+            if not weighted:
+                unweighted, _ = aggregate_groups(groups, None, method)
+                assert np.allclose(unweighted, actual, equal_nan=True)
+
+    # equal weights give the ordinary median, and "mean" keeps the old quote
+    prices = [100.0, 110.0, 120.0, 130.0]
+    assert aggregate_groups([prices], None, "median")[0][0] == np.median(prices)
+    offers = [{"price": p} for p in prices]
+    assert quote_price(offers, "mean") == round(sum(prices) / len(prices) * pricing.PRICE_MARKUP, 2)
+    # a mis-parsed price no longer drags the quote
+    skewed = offers + [{"price": 115000.0}]
+    assert quote_price(skewed, "iqr") == quote_price(offers, "iqr")
+    assert quote_price([], "iqr") is None and quote_price([{"price": None}], "median") is None
+    # currency conversion and source weights
+    pricing.CURRENCY_RATES["PLN"] = 0.25
+    assert quote_price([{"price": 400.0, "currency": "PLN"}], "mean") == round(100.0 * pricing.PRICE_MARKUP, 2)
+    assert quote_price([{"price": 1.0, "currency": "XXX"}], "mean") is None
+    pricing.SOURCE_WEIGHTS["ebay"] = 3.0
+    weighted_quote = quote_price([{"price": 100.0, "source": "rrr"}, {"price": 200.0, "source": "ebay"}], "mean")
+    assert weighted_quote == round(175.0 * pricing.PRICE_MARKUP, 2)
+    pricing.SOURCE_WEIGHTS["ebay"] = 1.0
+    print("correctness checks passed")
+
+
+# ----------------------------- Timing -----------------------------
+
+
+def timed(func: Callable[[], object], rounds: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--oems", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    check(rng)
+
+    groups, weights = random_groups(args.oems, rng, weighted=True)
+    offers = sum(len(group) for group in groups)
+    print(f"{args.oems} OEMs, {offers} offers")
+    print(f"{'method':<10}{'per-OEM ms':>12}{'batch ms':>10}{'speedup':>10}")
+    for method in METHODS:
+        loop = timed(lambda: [reference(g, w, method) for g, w in zip(groups, weights)], args.rounds)
+        batch = timed(lambda: aggregate_groups(groups, weights, method), args.rounds)
+        print(f"{method:<10}{loop * 1000:>12.1f}{batch * 1000:>10.1f}{loop / batch:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Load-test /api/part end to end and compare the run with a previous one.
+
+Start the stub marketplaces and the app pointed at them, then run from the
+repository root:
+
+    python stub_marketplace.py data/recording.jsonl
+    RRR_BASE_URL=http://127.0.0.1:8801 EBAY_BASE_URL=http://127.0.0.1:8802 \\
+        CACHE_WARM_INTERVAL=0 uvicorn main:app --port 8000
+    python benchmarks/load_test.py data/recording.jsonl [--concurrency N]
+        [--requests N] [--out run.json] [--baseline previous.json]
+
+Queries are the search terms found in the recording (or --queries FILE, one
+per line), sent round-robin by N concurrent clients. Latency percentiles,
+throughput and status counts are printed, saved with --out, and compared
+with a saved run given as --baseline. Scrape results are cached by the app,
+so start it on an empty data directory to measure scraping rather than
+cache hits.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_store import FixtureStore  # noqa: E402
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    # nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_load(url: str, queries: List[str], concurrency: int, requests: int, timeout: float) -> Dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    next_request = 0
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        nonlocal next_request
+        while next_request < requests:
+            query = queries[next_request % len(queries)]
+            next_request += 1
+            start = time.perf_counter()
+            try:
+                response = await client.get(f"{url}/api/part", params={"q": query})
+                status = str(response.status_code)
+                if response.status_code == 200 and "error" in response.json():
+                    status = "200 error"
+            except httpx.HTTPError as error:
+                status = type(error).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "statuses": statuses,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(ordered, pct) * 1000, 1)
+    return summary
+
+
+def report(run: Dict, baseline: Optional[Dict]) -> None:
+    rows = [("throughput", "req/s")] + [(f"p{pct}_ms", "ms") for pct in PERCENTILES]
+    print(f"{run['requests']} requests, {run['concurrency']} clients, {run['seconds']} s, statuses {run['statuses']}")
+    print(f"{'metric':<12}{'this run':>15}" + (f"{'baseline':>15}{'change':>10}" if baseline else ""))
+    for key, unit in rows:
+        line = f"{key:<12}{run[key]:>9} {unit:<5}"
+        if baseline and baseline.get(key):
+            change = (run[key] - baseline[key]) / baseline[key] * 100
+            line += f"{baseline[key]:>9} {unit:<5}{change:>+9.1f}%"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", nargs="?", help="recording to take the search terms from")
+    parser.add_argument("--queries", help="file with one query per line")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--out", help="save this run as JSON")
+    parser.add_argument("--baseline", help="JSON of a previous run to compare with")
+    args = parser.parse_args()
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as fp:
+            queries = [line.strip() for line in fp if line.strip()]
+    elif args.fixtures:
+        queries = FixtureStore(args.fixtures).load().search_terms()
+    else:
+        raise SystemExit("pass a recording or --queries")
+    if not queries:
+        raise SystemExit("no queries to send")
+
+    run = asyncio.run(run_load(args.url.rstrip("/"), queries, max(1, args.concurrency), args.requests, args.timeout))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+    report(run, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fp:
+            json.dump(run, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
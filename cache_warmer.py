@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from analytics import part_demand
+from catalog_manager import get_cached
+from file_lock import try_file_lock
+from http_client import create_client
+from oem_extractor import classify
+
+# seconds between warming rounds in the app; 0 disables the background warmer
+WARM_INTERVAL_SECONDS = float(os.getenv("CACHE_WARM_INTERVAL", "900"))
+# demand is ranked over this many days of request logs
+WARM_DEMAND_DAYS = int(os.getenv("CACHE_WARM_DAYS", "7"))
+WARM_TOP_PARTS = int(os.getenv("CACHE_WARM_TOP", "200"))
+# entries expiring within this window are refreshed before they do
+WARM_AHEAD_SECONDS = float(os.getenv("CACHE_WARM_AHEAD", str(12 * 3600)))
+# outbound HTTP requests one round may spend; checked before each refresh
+# starts, so a round can overshoot by the refreshes already running
+WARM_REQUEST_BUDGET = int(os.getenv("CACHE_WARM_BUDGET", "300"))
+WARM_CONCURRENCY = int(os.getenv("CACHE_WARM_CONCURRENCY", "4"))
+# parts whose refresh could not reach a marketplace are skipped this long
+WARM_RETRY_SECONDS = float(os.getenv("CACHE_WARM_RETRY", "3600"))
+# held during a round; holds the start time of the last round, shared by
+# all worker processes
+WARM_LOCK_PATH = os.path.join("data", "cache_warmer.lock")
+
+# refresh(oem, client) scrapes the OEM on the given client and caches the
+# result: True when offers were found, False when the marketplaces answered
+# without any (cached as a negative entry), None when they could not be asked
+Refresher = Callable[[str, httpx.AsyncClient], Awaitable[Optional[bool]]]
+
+
+def due_for_refresh(part: str, now: float, ahead: float) -> bool:
+    cached = get_cached(part, allow_stale=True, any_age=True)
+    if cached is None:
+        # never cached (or purged): only worth a scrape if it looks like an OEM
+        return bool(classify(part))
+    if cached.get("negative"):
+        return False
+    return cached["expires_at"] - now < ahead
+
+
+class CacheWarmer:
+    # Refreshes the cache entries of the most requested parts before they
+    # expire, so hot parts are served from cache. Runs on its own HTTP client
+    # so its requests can be counted against the budget. Every worker process
+    # runs a warmer, but the lock file lets only one of them warm per
+    # interval, so the budget holds for the whole deployment.
+
+    def __init__(
+        self,
+        refresh: Refresher,
+        top: int = WARM_TOP_PARTS,
+        days: int = WARM_DEMAND_DAYS,
+        ahead: float = WARM_AHEAD_SECONDS,
+        budget: int = WARM_REQUEST_BUDGET,
+        concurrency: int = WARM_CONCURRENCY,
+        lock_path: str = WARM_LOCK_PATH,
+    ) -> None:
+        self.refresh = refresh
+        self.top = top
+        self.days = days
+        self.ahead = ahead
+        self.budget = budget
+        self.concurrency = max(1, concurrency)
+        self.lock_path = lock_path
+        self.requests = 0
+        # part -> time before which an unreachable part is not retried
+        self.retry_at: Dict[str, float] = {}
+
+    async def _count_request(self, _: httpx.Request) -> None:
+        self.requests += 1
+
+    async def due_parts(self) -> List[str]:
+        demand = await asyncio.to_thread(part_demand, self.days, self.top)
+        now = time.time()
+        return [
+            part
+            for part, _ in demand
+            if self.retry_at.get(part, 0.0) <= now and due_for_refresh(part, now, self.ahead)
+        ]
+
+    async def run_once(self, interval: float = 0.0) -> Dict[str, int]:
+        # skipped while another process warms, or when any process started a
+        # round less than `interval` seconds ago
+        lock_fp = try_file_lock(self.lock_path)
+        if lock_fp is None:
+            return {"skipped": 1}
+        try:
+            lock_fp.seek(0)
+            try:
+                last_round = float(lock_fp.read().strip() or 0)
+            except ValueError:
+                last_round = 0.0
+            now = time.time()
+            if interval and now - last_round < interval:
+                return {"skipped": 1}
+            lock_fp.seek(0)
+            lock_fp.truncate()
+            lock_fp.write(f"{now}\n")
+            lock_fp.flush()
+            return await self._warm()
+        finally:
+            lock_fp.close()
+
+    async def _warm(self) -> Dict[str, int]:
+        due = await self.due_parts()
+        stats = {"due": len(due), "refreshed": 0, "empty": 0, "failed": 0, "requests": 0}
+        self.requests = 0
+        queue = list(due)
+
+        async with create_client(event_hooks={"request": [self._count_request]}) as client:
+
+            async def worker() -> None:
+                while queue and self.requests < self.budget:
+                    part = queue.pop(0)
+                    try:
+                        found = await self.refresh(part, client)
+                    except Exception as error:  # one bad part must not stop the round
+                        print(f"Cache warmer failed to refresh {part}: {error}")
+                        found = None
+                    if found is None:
+                        self.retry_at[part] = time.time() + WARM_RETRY_SECONDS
+                        stats["failed"] += 1
+                    else:
+                        stats["refreshed" if found else "empty"] += 1
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        stats["requests"] = self.requests
+        stats["left"] = len(queue)
+        return stats
+
+    async def run_forever(self, interval: float = WARM_INTERVAL_SECONDS) -> None:
+        while True:
+            try:
+                stats = await self.run_once(interval)
+                if not stats.get("skipped"):
+                    print("Cache warmer round:", stats)
+            except Exception as error:
+                print("Cache warmer round failed:", error)
+            await asyncio.sleep(interval)
+
+
+def start_cache_warmer(refresh: Refresher, interval: float = WARM_INTERVAL_SECONDS) -> Optional[asyncio.Task]:
+    if interval <= 0:
+        return None
+    return asyncio.create_task(CacheWarmer(refresh).run_forever(interval))
+
+
+async def stop_cache_warmer(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the cache entries of the most requested parts")
+    parser.add_argument("--top", type=int, default=WARM_TOP_PARTS)
+    parser.add_argument("--days", type=int, default=WARM_DEMAND_DAYS)
+    parser.add_argument("--ahead", type=float, default=WARM_AHEAD_SECONDS, help="seconds before expiry")
+    parser.add_argument("--budget", type=int, default=WARM_REQUEST_BUDGET, help="outbound requests")
+    parser.add_argument("--dry-run", action="store_true", help="only list the parts due for a refresh")
+    args = parser.parse_args()
+
+    from main import warm_candidate
+
+    warmer = CacheWarmer(warm_candidate, top=args.top, days=args.days, ahead=args.ahead, budget=args.budget)
+    if args.dry_run:
+        for part in asyncio.run(warmer.due_parts()):
+            print(part)
+    else:
+        print(asyncio.run(warmer.run_once()))
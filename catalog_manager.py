@@ -1,12 +1,41 @@
 import json
+import multiprocessing
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from file_lock import file_lock
 
 CATALOG_PATH = os.path.join("data", "catalog.json")
 CACHE_PATH = os.path.join("data", "scrape_cache.json")
+KEYWORD_PATH = os.path.join("data", "keyword_oems.json")
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", os.path.join("data", "catalog.db"))
+# "json" (journaled JSON files) or "sqlite"
+CATALOG_BACKEND = os.getenv("CATALOG_BACKEND", "json")
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+PURGE_INTERVAL_SECONDS = 3600
+
+# freshness per result source; an entry is fresh for its shortest-lived source
+CACHE_TTLS: Dict[str, float] = {
+    "rrr": float(os.getenv("CACHE_TTL_RRR", str(CACHE_TTL_SECONDS))),
+    "ebay": float(os.getenv("CACHE_TTL_EBAY", str(CACHE_TTL_SECONDS))),
+    "negative": float(os.getenv("CACHE_TTL_NEGATIVE", str(15 * 60))),
+}
+# how long past expiry an entry may still be served while it is refreshed
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", str(7 * 24 * 3600)))
+# OEMs found by scraping rrr.lt for a free-text keyword; keywords that found
+# nothing are remembered for CACHE_TTL_NEGATIVE
+KEYWORD_TTL_SECONDS = float(os.getenv("KEYWORD_OEM_TTL", str(CACHE_TTL_SECONDS)))
 DEFAULT_STRUCTURE: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
 
+# journal entries appended before the snapshot file is rewritten
+COMPACT_EVERY = int(os.getenv("CATALOG_COMPACT_EVERY", "500"))
+
 
 def _ensure_file(path: str, default_content) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -26,59 +55,679 @@ def _load_json(path: str, default_content):
 
 def _write_json(path: str, data) -> None:
     _ensure_file(path, data)
-    with open(path, "w", encoding="utf-8") as fp:
-        json.dump(data, fp, indent=2, ensure_ascii=False)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(data, fp, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
 
 
-def get_known_oems(car: str, model: str, detail: str, base_catalog: Optional[Dict] = None) -> List[str]:
-    catalog_data = _load_json(CATALOG_PATH, DEFAULT_STRUCTURE)
-    merged_catalog: Dict = {}
-    if base_catalog:
-        merged_catalog.update(base_catalog)
-    # merge persisted catalog
-    for car_key, models in catalog_data.items():
-        merged_catalog.setdefault(car_key, {}).update(models)
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _read_range(path: str, start: int, end: Optional[int] = None) -> bytes:
+    try:
+        with open(path, "rb") as fp:
+            fp.seek(start)
+            return fp.read() if end is None else fp.read(max(0, end - start))
+    except OSError:
+        return b""
+
+
+def _journal_lines(chunk: bytes) -> Iterator[Tuple[Tuple[str, ...], object]]:
+    # (key, value) of every complete line; a torn last line is left for later
+    for line in chunk[: chunk.rfind(b"\n") + 1].splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        yield tuple(entry.get("k", [])), entry.get("v")
+
+
+def _apply_to(data: Dict, key: Tuple[str, ...], value) -> None:
+    if not key:
+        return
+    node = data
+    for part in key[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            child = node[part] = {}
+        node = child
+    if value is None:
+        node.pop(key[-1], None)
+    else:
+        node[key[-1]] = value
+
+
+def _build_snapshot(path: str, journal_path: str, cut: int, tmp_path: str, default_content: Dict) -> None:
+    # snapshot plus the first `cut` bytes of the journal, written to tmp_path
+    data = _load_json(path, default_content)
+    if not isinstance(data, dict):
+        data = {}
+    for key, value in _journal_lines(_read_range(journal_path, 0, cut)):
+        _apply_to(data, key, value)
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        fp.write(payload)
+
+
+class JournaledStore:
+    # Process-resident view of a nested JSON document. The JSON file is the
+    # snapshot; every change is appended to "<path>.journal" as one JSON line
+    # and replayed by the other workers, which tail the journal from the last
+    # offset they read.
+    #
+    # Once the journal grows past COMPACT_EVERY entries a background thread
+    # folds it into a new snapshot. The file lock is only held to cut the
+    # journal and to swap the files in, never while the snapshot is built.
+    # The folded part of the journal is kept as "<path>.journal.prev" and the
+    # cut recorded in "<path>.compaction", so the other workers just move
+    # their journal offset instead of reloading the snapshot.
+
+    def __init__(self, path: str, default_content: Dict) -> None:
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.previous_journal_path = f"{path}.journal.prev"
+        self.marker_path = f"{path}.compaction"
+        self.lock_path = f"{path}.lock"
+        self.default_content = default_content
+        self._data: Dict = {}
+        self._loaded = False
+        self._snapshot_sig: Optional[Tuple[int, int, int]] = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._compacting = False
+        self._mutex = threading.RLock()
+
+    def _is_current(self) -> bool:
+        if not self._loaded or _file_signature(self.path) != self._snapshot_sig:
+            return False
+        journal_sig = _file_signature(self.journal_path)
+        journal_size = journal_sig[2] if journal_sig else 0
+        return journal_size == self._journal_offset
+
+    def _reload_snapshot(self) -> None:
+        self._data = _load_json(self.path, self.default_content)
+        if not isinstance(self._data, dict):
+            self._data = {}
+        self._snapshot_sig = _file_signature(self.path)
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._loaded = True
+
+    def _replay(self, path: str, end: Optional[int] = None) -> None:
+        chunk = _read_range(path, self._journal_offset, end)
+        for key, value in _journal_lines(chunk):
+            self._apply(key, value)
+            self._journal_entries += 1
+        self._journal_offset += chunk.rfind(b"\n") + 1
+
+    def _follow_compaction(self, snapshot_sig: Optional[Tuple[int, int, int]]) -> None:
+        # the snapshot was rewritten by a compaction; when it started from the
+        # snapshot this view is based on, catch up to the cut and carry on in
+        # the new journal, otherwise (more than one compaction missed) reload
+        try:
+            with open(self.marker_path, "r", encoding="utf-8") as fp:
+                marker = json.load(fp)
+        except (OSError, ValueError):
+            marker = {}
+        previous, snapshot = marker.get("previous"), marker.get("snapshot")
+        if (
+            previous is None
+            or snapshot is None
+            or tuple(previous) != self._snapshot_sig
+            or tuple(snapshot) != snapshot_sig
+        ):
+            self._reload_snapshot()
+            return
+        cut = marker["cut"]
+        self._replay(self.previous_journal_path, cut)
+        self._snapshot_sig = snapshot_sig
+        self._journal_offset = max(0, self._journal_offset - cut)
+        self._journal_entries = 0
+
+    def _refresh(self) -> None:
+        # caller holds the file lock
+        snapshot_sig = _file_signature(self.path)
+        if not self._loaded:
+            self._reload_snapshot()
+        elif snapshot_sig != self._snapshot_sig:
+            self._follow_compaction(snapshot_sig)
+        self._replay(self.journal_path)
+
+    def _apply(self, key: Tuple[str, ...], value) -> None:
+        _apply_to(self._data, key, value)
+
+    def _sync(self) -> None:
+        with self._mutex:
+            if self._is_current():
+                return
+            with file_lock(self.lock_path, exclusive=False):
+                self._refresh()
+
+    def get(self, key: Tuple[str, ...]):
+        self._sync()
+        with self._mutex:
+            return self._lookup(key)
+
+    def get_many(self, keys: List[Tuple[str, ...]]) -> List:
+        self._sync()
+        with self._mutex:
+            return [self._lookup(key) for key in keys]
+
+    def update(self, key: Tuple[str, ...], mutate) -> bool:
+        # mutate(current_value) returns the new value, or the current one
+        # unchanged; returns whether anything was written
+        with self._mutex, file_lock(self.lock_path, exclusive=True):
+            self._refresh()
+            current = self._lookup(key)
+            value = mutate(current)
+            if value is current:
+                return False
+            self._apply(key, value)
+            line = json.dumps({"k": list(key), "v": value}, ensure_ascii=False) + "\n"
+            with open(self.journal_path, "ab") as fp:
+                fp.write(line.encode("utf-8"))
+                self._journal_offset = fp.tell()
+            self._journal_entries += 1
+            if self._journal_entries >= COMPACT_EVERY and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self._compact, name=f"compact {self.path}", daemon=True).start()
+            return True
 
+    def set(self, key: Tuple[str, ...], value) -> bool:
+        return self.update(key, lambda _: value)
+
+    def _lookup(self, key: Tuple[str, ...]):
+        node = self._data
+        for part in key:
+            if not isinstance(node, dict):
+                return None
+            node = node.get(part)
+            if node is None:
+                return None
+        return node
+
+    def _compact(self) -> None:
+        # runs on its own thread; see the class comment
+        tmp_path = ""
+        try:
+            with file_lock(self.lock_path, exclusive=True):
+                base_sig = _file_signature(self.path)
+                journal_sig = _file_signature(self.journal_path)
+                cut = journal_sig[2] if journal_sig else 0
+            if not cut:
+                return
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            args = (self.path, self.journal_path, cut, tmp_path, self.default_content)
+            # json holds the GIL for the whole parse and encode, which would
+            # stall the event loop for seconds on a large store even from a
+            # background thread, so the snapshot is built in a child process
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    pool.submit(_build_snapshot, *args).result()
+            except BrokenProcessPool:
+                _build_snapshot(*args)
+
+            with self._mutex, file_lock(self.lock_path, exclusive=True):
+                if _file_signature(self.path) != base_sig:
+                    # another worker compacted first
+                    os.remove(tmp_path)
+                    return
+                tail = _read_range(self.journal_path, cut)
+                os.replace(tmp_path, self.path)
+                os.replace(self.journal_path, self.previous_journal_path)
+                with open(self.journal_path, "wb") as fp:
+                    fp.write(tail)
+                marker = {"previous": base_sig, "snapshot": _file_signature(self.path), "cut": cut}
+                with open(f"{self.marker_path}.tmp", "w", encoding="utf-8") as fp:
+                    json.dump(marker, fp)
+                os.replace(f"{self.marker_path}.tmp", self.marker_path)
+                self._refresh()
+        except OSError as error:
+            print(f"Compacting {self.path} failed: {error}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            self._compacting = False
+
+
+def _entry_age_seconds(entry: Dict) -> Optional[float]:
+    try:
+        ts = datetime.fromisoformat(entry.get("timestamp", ""))
+    except (TypeError, ValueError):
+        return None
+    return (datetime.utcnow() - ts).total_seconds()
+
+
+def _cache_ttl(sources: List[str]) -> float:
+    return min((CACHE_TTLS.get(source, CACHE_TTL_SECONDS) for source in sources), default=CACHE_TTL_SECONDS)
+
+
+def _with_expiry(entry: Dict) -> Optional[Dict]:
+    # entries written before per-source TTLs only carry a timestamp
+    if "expires_at" in entry and "stale_until" in entry:
+        return entry
+    age = _entry_age_seconds(entry)
+    if age is None:
+        return None
+    fetched_at = time.time() - age
+    expires_at = fetched_at + _cache_ttl(entry.get("sources") or [])
+    stale_until = expires_at if entry.get("negative") else expires_at + CACHE_STALE_SECONDS
+    return dict(entry, expires_at=expires_at, stale_until=stale_until)
+
+
+class JsonBackend:
+    def __init__(
+        self, catalog_path: str = CATALOG_PATH, cache_path: str = CACHE_PATH, keyword_path: str = KEYWORD_PATH
+    ) -> None:
+        self.catalog = JournaledStore(catalog_path, DEFAULT_STRUCTURE)
+        self.cache = JournaledStore(cache_path, {})
+        self.keywords = JournaledStore(keyword_path, {})
+
+    def known_oems(self, car: str, model: str, detail: str) -> Optional[List[str]]:
+        # None means the (car, model) slot has never been persisted
+        persisted_model = self.catalog.get((car, model))
+        if not isinstance(persisted_model, dict):
+            return None
+        detail_list = persisted_model.get(detail, [])
+        return list(detail_list) if isinstance(detail_list, list) else []
+
+    def add_oem(self, car: str, model: str, detail: str, oem: str) -> bool:
+        def add(current):
+            known = current if isinstance(current, list) else []
+            if oem in known:
+                return current
+            return known + [oem]
+
+        return self.catalog.update((car, model, detail), add)
+
+    def cache_get(self, oem: str, now: float) -> Optional[Dict]:
+        return self._live_entry(self.cache.get((oem,)), now)
+
+    def cache_get_many(self, oems: List[str], now: float) -> Dict[str, Dict]:
+        entries = self.cache.get_many([(oem,) for oem in oems])
+        found = {oem: self._live_entry(data, now) for oem, data in zip(oems, entries)}
+        return {oem: data for oem, data in found.items() if data}
+
+    @staticmethod
+    def _live_entry(data: Optional[Dict], now: float) -> Optional[Dict]:
+        if not data:
+            return None
+        data = _with_expiry(data)
+        if data is None or data["stale_until"] < now:
+            return None
+        return dict(data)
+
+    def cache_put(self, oem: str, entry: Dict) -> None:
+        self.cache.set((oem,), entry)
+
+    def keyword_get(self, keyword: str, now: float) -> Optional[List[str]]:
+        entry = self.keywords.get((keyword,))
+        if not isinstance(entry, dict) or entry.get("expires_at", 0) < now:
+            return None
+        return list(entry.get("oems", []))
+
+    def keyword_put(self, keyword: str, oems: List[str], expires_at: float) -> None:
+        self.keywords.set((keyword,), {"oems": oems, "expires_at": expires_at})
+
+
+class SqliteBackend:
+    # Embedded SQLite store in WAL mode: readers never block the single writer,
+    # and several uvicorn workers can share one database file safely.
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS catalog (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            car TEXT NOT NULL,
+            model TEXT NOT NULL,
+            detail TEXT NOT NULL,
+            oem TEXT NOT NULL,
+            UNIQUE (car, model, detail, oem)
+        );
+        CREATE TABLE IF NOT EXISTS scrape_cache (
+            oem TEXT PRIMARY KEY,
+            prices TEXT NOT NULL,
+            image TEXT,
+            timestamp TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            sources TEXT NOT NULL DEFAULT '[]',
+            negative INTEGER NOT NULL DEFAULT 0,
+            expires_at REAL,
+            stale_until REAL,
+            price_sources TEXT NOT NULL DEFAULT '[]'
+        );
+        CREATE TABLE IF NOT EXISTS keyword_oems (
+            keyword TEXT PRIMARY KEY,
+            oems TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+    """
+
+    # columns added after the first release (new databases get them from
+    # SCHEMA), with the SQL used to backfill them in older databases
+    CACHE_COLUMNS = {
+        "sources": ("TEXT NOT NULL DEFAULT '[]'", None),
+        "negative": ("INTEGER NOT NULL DEFAULT 0", None),
+        "expires_at": ("REAL", "fetched_at + {ttl}"),
+        "stale_until": ("REAL", "fetched_at + {ttl} + {stale}"),
+        "price_sources": ("TEXT NOT NULL DEFAULT '[]'", None),
+    }
+
+    def __init__(self, path: str = CATALOG_DB_PATH) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        self._migrate(conn)
+
+    def _missing_columns(self, conn: sqlite3.Connection) -> List[str]:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(scrape_cache)")}
+        return [column for column in self.CACHE_COLUMNS if column not in existing]
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        # Every worker process runs this at startup. The write lock is taken
+        # before the columns are checked again, so only the first process to
+        # get it alters the table.
+        if self._missing_columns(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for column in self._missing_columns(conn):
+                    definition, backfill = self.CACHE_COLUMNS[column]
+                    conn.execute(f"ALTER TABLE scrape_cache ADD COLUMN {column} {definition}")
+                    if backfill:
+                        expression = backfill.format(ttl=CACHE_TTL_SECONDS, stale=CACHE_STALE_SECONDS)
+                        conn.execute(f"UPDATE scrape_cache SET {column} = {expression}")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        conn.execute("CREATE INDEX IF NOT EXISTS scrape_cache_stale_until ON scrape_cache (stale_until)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def known_oems(self, car: str, model: str, detail: str) -> Optional[List[str]]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT oem FROM catalog WHERE car = ? AND model = ? AND detail = ? ORDER BY id",
+            (car, model, detail),
+        ).fetchall()
+        if rows:
+            return [row[0] for row in rows]
+        slot = conn.execute("SELECT 1 FROM catalog WHERE car = ? AND model = ? LIMIT 1", (car, model)).fetchone()
+        return [] if slot else None
+
+    def add_oem(self, car: str, model: str, detail: str, oem: str) -> bool:
+        cursor = self._connect().execute(
+            "INSERT OR IGNORE INTO catalog (car, model, detail, oem) VALUES (?, ?, ?, ?)",
+            (car, model, detail, oem),
+        )
+        return cursor.rowcount > 0
+
+    CACHE_SELECT = (
+        "SELECT oem, prices, image, timestamp, sources, negative, expires_at, stale_until, price_sources "
+        "FROM scrape_cache"
+    )
+    # stays below SQLite's default limit on bound parameters
+    MAX_IN_PARAMS = 500
+
+    @staticmethod
+    def _cache_row(row: Tuple) -> Dict:
+        return {
+            "prices": json.loads(row[1]),
+            "image": row[2],
+            "timestamp": row[3],
+            "sources": json.loads(row[4]),
+            "negative": bool(row[5]),
+            "expires_at": row[6],
+            "stale_until": row[7],
+            "price_sources": json.loads(row[8]),
+        }
+
+    def cache_get(self, oem: str, now: float) -> Optional[Dict]:
+        row = self._connect().execute(
+            f"{self.CACHE_SELECT} WHERE oem = ? AND stale_until >= ?",
+            (oem, now),
+        ).fetchone()
+        return self._cache_row(row) if row else None
+
+    def cache_get_many(self, oems: List[str], now: float) -> Dict[str, Dict]:
+        conn = self._connect()
+        unique = list(dict.fromkeys(oems))
+        found: Dict[str, Dict] = {}
+        for start in range(0, len(unique), self.MAX_IN_PARAMS):
+            chunk = unique[start:start + self.MAX_IN_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = conn.execute(
+                f"{self.CACHE_SELECT} WHERE oem IN ({placeholders}) AND stale_until >= ?",
+                (*chunk, now),
+            ).fetchall()
+            found.update((row[0], self._cache_row(row)) for row in rows)
+        return found
+
+    def cache_put(self, oem: str, entry: Dict) -> None:
+        entry = _with_expiry(entry)
+        if entry is None:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO scrape_cache "
+            "(oem, prices, image, timestamp, fetched_at, sources, negative, expires_at, stale_until, price_sources) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                oem,
+                json.dumps(entry.get("prices", [])),
+                entry.get("image"),
+                entry.get("timestamp", ""),
+                now - (_entry_age_seconds(entry) or 0.0),
+                json.dumps(entry.get("sources") or []),
+                int(bool(entry.get("negative"))),
+                entry["expires_at"],
+                entry["stale_until"],
+                json.dumps(entry.get("price_sources") or []),
+            ),
+        )
+        if now - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            conn.execute("DELETE FROM scrape_cache WHERE stale_until < ?", (now,))
+            conn.execute("DELETE FROM keyword_oems WHERE expires_at < ?", (now,))
+
+    def keyword_get(self, keyword: str, now: float) -> Optional[List[str]]:
+        row = self._connect().execute(
+            "SELECT oems FROM keyword_oems WHERE keyword = ? AND expires_at >= ?", (keyword, now)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def keyword_put(self, keyword: str, oems: List[str], expires_at: float) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO keyword_oems (keyword, oems, expires_at) VALUES (?, ?, ?)",
+            (keyword, json.dumps(oems), expires_at),
+        )
+
+
+def create_backend(name: str = CATALOG_BACKEND):
+    if name == "sqlite":
+        return SqliteBackend()
+    if name == "json":
+        return JsonBackend()
+    raise ValueError(f"Unknown catalog backend: {name}")
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def preload_backend() -> None:
+    # reads the JSON snapshots before the first request needs them
+    backend = get_backend()
+    if isinstance(backend, JsonBackend):
+        for store in (backend.catalog, backend.cache, backend.keywords):
+            store.get(())
+
+
+def set_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+
+# called with (car, model, detail, oem) when save_new_oem learns a new OEM,
+# e.g. to drop resolver results that did not know it yet. Only listeners in
+# the process that saved it are told; other workers catch up by expiry.
+OemListener = Callable[[str, str, str, str], None]
+_oem_listeners: List[OemListener] = []
+
+
+def import_json_files(backend, catalog_path: str = CATALOG_PATH, cache_path: str = CACHE_PATH) -> Tuple[int, int]:
+    # one-shot migration of the JSON snapshots (and any pending journal entries)
+    source = JsonBackend(catalog_path, cache_path)
+    oem_count = 0
+    for car, models in (source.catalog.get(()) or {}).items():
+        for model, details in models.items():
+            for detail, oems in details.items():
+                for oem in oems:
+                    backend.add_oem(car, model, detail, oem)
+                    oem_count += 1
+    cache_count = 0
+    for oem, entry in (source.cache.get(()) or {}).items():
+        if isinstance(entry, dict) and _with_expiry(entry) is not None:
+            backend.cache_put(oem, entry)
+            cache_count += 1
+    return oem_count, cache_count
+
+
+def get_known_oems(car: str, model: str, detail: str, base_catalog: Optional[Dict] = None) -> List[str]:
     if not car or not model or not detail:
         return []
 
-    car_entry = merged_catalog.get(car, {})
-    model_entry = car_entry.get(model, {})
-    detail_list = model_entry.get(detail, [])
+    # persisted models replace the seeded ones wholesale, as a dict merge would
+    persisted = get_backend().known_oems(car, model, detail)
+    if persisted is not None:
+        return persisted
+    detail_list = (base_catalog or {}).get(car, {}).get(model, {}).get(detail, [])
     return list(detail_list) if isinstance(detail_list, list) else []
 
 
+def add_oem_listener(listener: OemListener) -> None:
+    _oem_listeners.append(listener)
+
+
 def save_new_oem(car: str, model: str, detail: str, oem: str) -> None:
     if not (car and model and detail and oem):
         return
-    catalog_data = _load_json(CATALOG_PATH, DEFAULT_STRUCTURE)
-    catalog_data.setdefault(car, {}).setdefault(model, {}).setdefault(detail, [])
-    if oem not in catalog_data[car][model][detail]:
-        catalog_data[car][model][detail].append(oem)
-        _write_json(CATALOG_PATH, catalog_data)
+    if get_backend().add_oem(car, model, detail, oem):
+        for listener in _oem_listeners:
+            listener(car, model, detail, oem)
 
 
-def save_scrape_result(oem: str, prices: List[float], image: Optional[str]) -> None:
-    if not oem:
-        return
-    cache = _load_json(CACHE_PATH, {})
-    cache[oem] = {
+def _cache_entry(
+    prices: List[float],
+    image: Optional[str],
+    sources: List[str],
+    negative: bool = False,
+    price_sources: Optional[List[Optional[str]]] = None,
+) -> Dict:
+    now = time.time()
+    expires_at = now + _cache_ttl(sources)
+    return {
         "prices": prices,
+        # marketplace of each price, so cached offers are weighed like fresh ones
+        "price_sources": price_sources or [],
         "image": image,
         "timestamp": datetime.utcnow().isoformat(),
+        "sources": sources,
+        "negative": negative,
+        "expires_at": expires_at,
+        "stale_until": expires_at if negative else expires_at + CACHE_STALE_SECONDS,
     }
-    _write_json(CACHE_PATH, cache)
 
 
-def get_cached(oem: str) -> Optional[Dict]:
-    cache = _load_json(CACHE_PATH, {})
-    data = cache.get(oem)
+def save_scrape_result(
+    oem: str,
+    prices: List[float],
+    image: Optional[str],
+    sources: Optional[List[str]] = None,
+    price_sources: Optional[List[Optional[str]]] = None,
+) -> None:
+    if not oem:
+        return
+    entry = _cache_entry(prices, image, sources or ["rrr", "ebay"], price_sources=price_sources)
+    get_backend().cache_put(oem, entry)
+
+
+def save_negative_result(oem: str) -> None:
+    # remembers that nothing was found, so dead OEMs are not re-scraped every time
+    if not oem:
+        return
+    get_backend().cache_put(oem, _cache_entry([], None, ["negative"], negative=True))
+
+
+def get_cached(oem: str, allow_stale: bool = False, any_age: bool = False) -> Optional[Dict]:
+    # any_age also returns entries past their stale window (used while scrapers are tripped)
+    now = time.time()
+    data = get_backend().cache_get(oem, 0.0 if any_age else now)
     if not data:
         return None
-    try:
-        ts = datetime.fromisoformat(data.get("timestamp", ""))
-    except ValueError:
-        return None
-    if datetime.utcnow() - ts > timedelta(days=7):
+    stale = data["expires_at"] < now
+    if stale and not allow_stale:
         return None
+    data["stale"] = stale
     return data
+
+
+def get_cached_many(oems: List[str], allow_stale: bool = False) -> Dict[str, Dict]:
+    # one backend round-trip for many OEMs; misses are simply absent
+    now = time.time()
+    found: Dict[str, Dict] = {}
+    for oem, data in get_backend().cache_get_many(oems, now).items():
+        stale = data["expires_at"] < now
+        if stale and not allow_stale:
+            continue
+        data["stale"] = stale
+        found[oem] = data
+    return found
+
+
+def get_keyword_oems(keyword: str) -> Optional[List[str]]:
+    # None when the keyword was never scraped (or its findings expired)
+    if not keyword:
+        return None
+    return get_backend().keyword_get(keyword, time.time())
+
+
+def save_keyword_oems(keyword: str, oems: List[str]) -> None:
+    if not keyword:
+        return
+    ttl = KEYWORD_TTL_SECONDS if oems else CACHE_TTLS["negative"]
+    get_backend().keyword_put(keyword, oems, time.time() + ttl)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Catalog storage maintenance")
+    parser.add_argument("command", choices=["import-json"])
+    parser.add_argument("--db", default=CATALOG_DB_PATH, help="SQLite database to import into")
+    args = parser.parse_args()
+
+    oems, entries = import_json_files(SqliteBackend(args.db))
+    print(f"Imported {oems} catalog OEMs and {entries} cache entries into {args.db}")
@@ -0,0 +1,42 @@
+import os
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+# Advisory locks between worker processes, taken with flock on a side file.
+# Where fcntl is unavailable they only keep threads of one process apart if
+# the caller does that itself.
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(path, mode)
+
+
+@contextmanager
+def file_lock(path: str, exclusive: bool = True) -> Iterator[None]:
+    with _open(path, "a") as lock_fp:
+        if fcntl is not None:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_fp, fcntl.LOCK_UN)
+
+
+def try_file_lock(path: str) -> Optional[IO[str]]:
+    # exclusive lock without waiting: the open (readable) lock file, held
+    # until it is closed, or None when another process holds the lock
+    lock_fp = _open(path, "a+")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_fp.close()
+            return None
+    return lock_fp
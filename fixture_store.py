@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+from listing_parser import EBAY_BASE_URL, RRR_BASE_URL
+
+# responses seen by the scrapers are appended here when set (see http_client)
+RECORD_PATH = os.getenv("HTTP_RECORD_PATH", "")
+
+SITES: Dict[str, str] = {"rrr": RRR_BASE_URL, "ebay": EBAY_BASE_URL}
+# query parameter holding the search term on each site's search page
+SEARCH_PARAMS = {"rrr": ("/paieska/", "q"), "ebay": ("/sch/i.html", "_nkw")}
+
+
+# (status, content type, body)
+Fixture = Tuple[int, str, str]
+
+
+def split_url(url: str) -> Optional[Tuple[str, str]]:
+    # (site, path?query as sent on the wire) for URLs on a known marketplace
+    for site, base in SITES.items():
+        if url.startswith(base + "/") or url == base:
+            raw_path = httpx.URL(url).raw_path.decode("ascii")
+            prefix = urlsplit(base).path
+            return site, raw_path[len(prefix):] if raw_path.startswith(prefix) else raw_path
+    return None
+
+
+class FixtureStore:
+    # Recorded marketplace responses, one JSON object per line:
+    # {"site", "target", "base", "status", "content_type", "body"}. The file
+    # is only ever appended to; when a target was recorded twice the last
+    # recording wins.
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.fixtures: Dict[Tuple[str, str], Fixture] = {}
+        # marketplace root each site was recorded from, for rewriting links
+        self.bases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> "FixtureStore":
+        try:
+            with open(self.path, "r", encoding="utf-8") as fp:
+                for line in fp:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    self.fixtures[(row["site"], row["target"])] = (row["status"], row["content_type"], row["body"])
+                    self.bases[row["site"]] = row["base"]
+        except FileNotFoundError:
+            pass
+        return self
+
+    def get(self, site: str, target: str) -> Optional[Fixture]:
+        return self.fixtures.get((site, target))
+
+    def record(self, url: str, response: httpx.Response) -> None:
+        located = split_url(url)
+        if located is None:
+            return
+        site, target = located
+        row = {
+            "site": site,
+            "target": target,
+            "base": SITES[site],
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type", "text/html"),
+            "body": response.text,
+        }
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as fp:
+                fp.write(line)
+
+    def search_terms(self) -> List[str]:
+        # search terms that were recorded, e.g. to replay the same load
+        terms: List[str] = []
+        for site, target in self.fixtures:
+            path, param = SEARCH_PARAMS[site]
+            parts = urlsplit(target)
+            if parts.path == path:
+                terms.extend(parse_qs(parts.query).get(param, []))
+        return list(dict.fromkeys(terms))
+
+
+_recorder: Optional[FixtureStore] = None
+
+
+def get_recorder() -> Optional[FixtureStore]:
+    global _recorder
+    if RECORD_PATH and _recorder is None:
+        _recorder = FixtureStore(RECORD_PATH)
+        print(f"Recording marketplace responses to {RECORD_PATH}")
+    return _recorder
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from fixture_store import get_recorder
+from listing_parser import EBAY_BASE_URL, RRR_BASE_URL
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+except ImportError:  # optional: HTTP/1.1 keep-alive only
+    h2 = None
+
+REQUEST_TIMEOUT = 10.0
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 50
+KEEPALIVE_EXPIRY = 30.0
+# negotiated per host over TLS; ignored when the h2 package is missing
+HTTP2 = os.getenv("HTTP2", "1") == "1" and h2 is not None
+# dedicated connection pool per scraped host, so a burst of rrr.lt detail
+# pages cannot starve eBay searches (and vice versa)
+HOST_CONNECTIONS: Dict[str, int] = {urlsplit(RRR_BASE_URL).netloc: 64, urlsplit(EBAY_BASE_URL).netloc: 32}
+HOST_CONNECTIONS.update(json.loads(os.getenv("HTTP_HOST_CONNECTIONS", "{}")))
+# responses remembered for If-None-Match / If-Modified-Since revalidation
+# (only those that carried an ETag or Last-Modified); 0 disables it
+CONDITIONAL_CACHE_SIZE = int(os.getenv("HTTP_CONDITIONAL_CACHE_SIZE", "512"))
+CONDITIONAL_MAX_BYTES = 2 * 1024 * 1024
+# bodies kept in total, per worker process
+CONDITIONAL_CACHE_BYTES = int(os.getenv("HTTP_CONDITIONAL_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _limits(max_connections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_connections, MAX_KEEPALIVE_CONNECTIONS),
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def create_client(event_hooks: Optional[Dict[str, List[Callable]]] = None) -> httpx.AsyncClient:
+    mounts = {
+        f"all://{host}": httpx.AsyncHTTPTransport(http2=HTTP2, limits=_limits(connections))
+        for host, connections in HOST_CONNECTIONS.items()
+    }
+    return httpx.AsyncClient(
+        limits=_limits(MAX_CONNECTIONS),
+        timeout=REQUEST_TIMEOUT,
+        follow_redirects=True,
+        http2=HTTP2,
+        mounts=mounts,
+        event_hooks=event_hooks,
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    # lazily created so scripts that never run the app lifespan still work
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+
+async def start_client() -> httpx.AsyncClient:
+    return get_client()
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+VALIDATOR_HEADERS = ("if-none-match", "if-modified-since")
+
+# (validators, content type, body) of a remembered response
+CachedPage = Tuple[Dict[str, str], str, bytes]
+
+
+class ConditionalCache:
+    # Last body and validators per URL, bounded by entry count and total
+    # bytes. A 304 answer is turned back into the remembered 200 response, so
+    # callers never see the difference.
+
+    def __init__(self, max_entries: int = CONDITIONAL_CACHE_SIZE, max_bytes: int = CONDITIONAL_CACHE_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.revalidated = 0
+
+    def lookup(self, url: str) -> Optional[CachedPage]:
+        # the validators to send and the body to replay come from one
+        # snapshot, so an eviction during the request cannot split them
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def _drop(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
+
+    def store(self, url: str, response: httpx.Response) -> None:
+        if not self.max_entries or response.status_code != 200:
+            return
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+        with self._lock:
+            self._drop(url)
+            if not validators or len(response.content) > min(CONDITIONAL_MAX_BYTES, self.max_bytes):
+                return
+            content_type = response.headers.get("Content-Type", "text/html")
+            self._entries[url] = (validators, content_type, response.content)
+            self._bytes += len(response.content)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def replay(self, entry: CachedPage, response: httpx.Response) -> httpx.Response:
+        with self._lock:
+            self.revalidated += 1
+        _, content_type, content = entry
+        return httpx.Response(200, headers={"Content-Type": content_type}, content=content, request=response.request)
+
+
+_conditional = ConditionalCache()
+
+
+async def conditional_get(
+    url: str, headers: Optional[Dict[str, str]] = None, client: Optional[httpx.AsyncClient] = None
+) -> httpx.Response:
+    # GET that revalidates a previously seen page instead of downloading it again
+    client = client or get_client()
+    cached = _conditional.lookup(url)
+    request_headers = dict(headers or {})
+    if cached is not None:
+        request_headers.update(cached[0])
+    response = await client.get(url, headers=request_headers)
+    if response.status_code == 304 and cached is not None:
+        response = _conditional.replay(cached, response)
+    else:
+        if response.status_code == 304:
+            # nothing to replay: an empty 304 must not pass for a page
+            # without listings, so ask for the full page
+            plain = {k: v for k, v in (headers or {}).items() if k.lower() not in VALIDATOR_HEADERS}
+            response = await client.get(url, headers=plain)
+        _conditional.store(url, response)
+    recorder = get_recorder()
+    if recorder is not None and response.status_code != 304:
+        recorder.record(url, response)
+    return response
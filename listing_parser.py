@@ -0,0 +1,194 @@
+import os
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+
+PRICE_REGEX = re.compile(r"\d+[\d,.]*")
+
+# marketplace roots; point them at a local stub (see stub_marketplace.py) to
+# run the scrapers offline
+RRR_BASE_URL = os.getenv("RRR_BASE_URL", "https://rrr.lt").rstrip("/")
+EBAY_BASE_URL = os.getenv("EBAY_BASE_URL", "https://www.ebay.de").rstrip("/")
+
+
+def clean_price_text(text: str) -> Optional[float]:
+    if not text:
+        return None
+    text = text.replace("to", "-")
+    matches = PRICE_REGEX.findall(text)
+    if not matches:
+        return None
+    number_text = matches[0]
+    number_text = number_text.replace(".", "").replace(",", ".")
+    try:
+        return float(number_text)
+    except ValueError:
+        return None
+
+
+# ----------------------------- Selectors -----------------------------
+# XPath translations of the CSS selectors the BeautifulSoup scrapers used.
+# "(descendant::*[...])[1]" is select_one: the first match in document order.
+
+
+def _cls(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _any_of(*conditions: str) -> str:
+    return " or ".join(conditions)
+
+
+_SPAN_ITEMPROP_PRICE = "(self::span and @itemprop='price')"
+_RRR_PRICE = _any_of(_cls("price"), _cls("item-price"), _cls("search-item-price"), _SPAN_ITEMPROP_PRICE)
+
+RRR_CONTAINERS = etree.XPath(
+    f"//*[{_any_of(_cls('search-item'), _cls('item'), _cls('item-block'), _cls('items-box'))}]"
+)
+RRR_ALL_PRICES = etree.XPath(f"//*[{_RRR_PRICE}]")
+RRR_PRICE_ANYWHERE = etree.XPath(f"(//*[{_RRR_PRICE}])[1]")
+RRR_TITLE = etree.XPath(
+    "(descendant::*["
+    + _any_of(
+        _cls("item-title"),
+        _cls("title"),
+        "@itemprop='name'",
+        f"(self::a and ancestor::*[{_cls('part-name')}])",
+    )
+    + "])[1]"
+)
+RRR_PRICE = etree.XPath(f"(descendant::*[{_RRR_PRICE}])[1]")
+RRR_IMAGE = etree.XPath("(descendant::*[@itemprop='image' or self::img])[1]")
+RRR_IMAGE_ANYWHERE = etree.XPath("(//*[@itemprop='image' or self::img])[1]")
+# "a[href*='autodalis']" and ".part-name a" are both subsumed by "a"
+RRR_LINK = etree.XPath("(descendant::*[@itemprop='url' or self::a])[1]")
+
+EBAY_ITEMS = etree.XPath(f"//*[{_cls('s-item')}]")
+EBAY_PRICE = etree.XPath(f"(descendant::*[{_any_of(_cls('s-item__price'), _SPAN_ITEMPROP_PRICE)}])[1]")
+EBAY_IMAGE = etree.XPath(f"(descendant::*[{_cls('s-item__image-img')}])[1]")
+EBAY_LINK = etree.XPath(f"(descendant::*[{_cls('s-item__link')}])[1]")
+
+# BeautifulSoup's get_text() leaves out comments and script/style/template strings
+TEXT_NODES = etree.XPath("descendant::text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+
+FALLBACK_CONTAINER_TAGS = ("article", "li", "div")
+
+UTF8_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+
+# ----------------------------- Helpers -----------------------------
+
+def parse_html(html: str) -> Optional[etree._Element]:
+    if not html or not html.strip():
+        return None
+    try:
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # str input carrying an XML encoding declaration
+            return lxml.html.document_fromstring(html.encode("utf-8"), parser=UTF8_PARSER)
+    except etree.ParserError:
+        return None
+
+
+def element_text(element: etree._Element) -> str:
+    # same as BeautifulSoup's get_text(" ", strip=True)
+    return " ".join(stripped for stripped in (text.strip() for text in TEXT_NODES(element)) if stripped)
+
+
+def _first(xpath: etree.XPath, element: etree._Element) -> Optional[etree._Element]:
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def _matches_oem(text: str, target_oem: Optional[str]) -> bool:
+    # the scrapers also tried OEM_PATTERN.findall(text) (r"\b\d{5,12}\b"), but
+    # every match it returns is a substring of text, so it never found more
+    return not target_oem or target_oem in text
+
+
+# ----------------------------- rrr.lt -----------------------------
+
+def parse_rrr_item(item: etree._Element, base_url: str = RRR_BASE_URL) -> Optional[Dict]:
+    price_elem = _first(RRR_PRICE, item)
+    price = clean_price_text(element_text(price_elem)) if price_elem is not None else None
+    if price is None:
+        return None
+    title_elem = _first(RRR_TITLE, item)
+    image_elem = _first(RRR_IMAGE, item)
+    link_elem = _first(RRR_LINK, item)
+
+    link_href = link_elem.get("href") if link_elem is not None else None
+    link = urljoin(base_url, link_href) if link_href else None
+    image = image_elem.get("src") if image_elem is not None else None
+    title = element_text(title_elem) if title_elem is not None else None
+
+    return {"title": title, "price": price, "image": image, "link": link}
+
+
+def _fallback_containers(root: etree._Element) -> List[etree._Element]:
+    # Every article/li/div used to be a container. Only those wrapping a price
+    # element can yield a listing, so the rest are skipped without reading
+    # their text.
+    priced = set()
+    for price_elem in RRR_ALL_PRICES(root):
+        for ancestor in price_elem.iterancestors(*FALLBACK_CONTAINER_TAGS):
+            if ancestor in priced:
+                break
+            priced.add(ancestor)
+    if not priced:
+        return []
+    return [element for element in root.iter(*FALLBACK_CONTAINER_TAGS) if element in priced]
+
+
+def parse_rrr_listings(html: str, target_oem: Optional[str] = None, base_url: str = RRR_BASE_URL) -> List[Dict]:
+    root = parse_html(html)
+    if root is None:
+        return []
+    containers = RRR_CONTAINERS(root) or _fallback_containers(root)
+    results: List[Dict] = []
+    for item in containers:
+        if target_oem and not _matches_oem(element_text(item), target_oem):
+            continue
+        parsed = parse_rrr_item(item, base_url)
+        if parsed:
+            results.append(parsed)
+    return results
+
+
+def parse_rrr_detail(html: str, link: str, target_oem: Optional[str]) -> Optional[Dict]:
+    root = parse_html(html)
+    if root is None:
+        return None
+    if target_oem and not _matches_oem(element_text(root), target_oem):
+        return None
+    price_elem = _first(RRR_PRICE_ANYWHERE, root)
+    price = clean_price_text(element_text(price_elem)) if price_elem is not None else None
+    image_elem = _first(RRR_IMAGE_ANYWHERE, root)
+    image = image_elem.get("src") if image_elem is not None else None
+    if price:
+        return {"title": None, "price": price, "image": image, "link": link}
+    return None
+
+
+# ----------------------------- eBay -----------------------------
+
+def parse_ebay_listings(html: str) -> List[Dict]:
+    root = parse_html(html)
+    if root is None:
+        return []
+    results: List[Dict] = []
+    for item in EBAY_ITEMS(root):
+        price_elem = _first(EBAY_PRICE, item)
+        price = clean_price_text(element_text(price_elem)) if price_elem is not None else None
+        if price is None:
+            continue
+        image_elem = _first(EBAY_IMAGE, item)
+        link_elem = _first(EBAY_LINK, item)
+        link = link_elem.get("href") if link_elem is not None else None
+        image = image_elem.get("src") if image_elem is not None else None
+        results.append({"title": None, "price": price, "image": image, "link": link})
+    return results
@@ -1,25 +1,57 @@
-import csv
+import asyncio
 import json
 import os
 import random
 import re
 import string
-import time
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from urllib.parse import quote, urljoin
-
-import requests
-from bs4 import BeautifulSoup
-from fastapi import FastAPI, Query, Request
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import httpx
+from fastapi import Body, FastAPI, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from catalog_manager import get_cached, get_known_oems, save_new_oem, save_scrape_result
-from oem_resolver import resolve_oem
+from analytics import ANALYTICS_TIMEOUT, part_analytics
+from cache_warmer import start_cache_warmer, stop_cache_warmer
+from catalog_manager import (
+    get_cached,
+    get_cached_many,
+    get_known_oems,
+    preload_backend,
+    save_negative_result,
+    save_new_oem,
+    save_scrape_result,
+)
+from http_client import close_client, get_client, start_client
+from listing_parser import EBAY_BASE_URL, RRR_BASE_URL, parse_ebay_listings, parse_rrr_detail, parse_rrr_listings
+from oem_resolver import resolve_oem_async
+from pricing import quote_offers, quote_price
+from request_log import close_request_log, log_request, log_requests
+from singleflight import Broadcast, SingleFlight
+from traffic_governor import any_tripped, governed_get
+from vehicle_index import ReloadingVehicleIndex
+from worker_pool import PoolSaturated, run_cpu, shutdown_pool
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await start_client()
+    CARS_INDEX.get()
+    await asyncio.to_thread(preload_backend)
+    warmer = start_cache_warmer(warm_candidate)
+    try:
+        yield
+    finally:
+        await stop_cache_warmer(warmer)
+        await close_client()
+        shutdown_pool()
+        await close_request_log()
+
 
-app = FastAPI(title="Part Price Aggregator")
+app = FastAPI(title="Part Price Aggregator", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
@@ -30,8 +62,26 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
 ]
 
-PRICE_REGEX = re.compile(r"\d+[\d,.]*")
-OEM_PATTERN = re.compile(r"\b\d{5,12}\b")
+# number of OEM candidates searched concurrently in get_part
+CANDIDATE_FANOUT = 3
+
+# detail-page enrichment in RrrScraper.search_direct
+DETAIL_CONCURRENCY = int(os.getenv("RRR_DETAIL_CONCURRENCY", "6"))
+DETAIL_BUDGET_SECONDS = float(os.getenv("RRR_DETAIL_BUDGET", "8"))
+MAX_DETAIL_MATCHES = int(os.getenv("RRR_MAX_DETAIL_MATCHES", "0")) or None
+
+# speculative (hedged) strategy racing in RrrScraper.search; opt-in, since
+# every hedge that fires is one more search page load on rrr.lt
+SPECULATIVE_SEARCH = os.getenv("RRR_SPECULATIVE", "0") == "1"
+HEDGE_DELAY_SECONDS = float(os.getenv("RRR_HEDGE_DELAY", "1.5"))
+
+# POST /api/parts: items per request, items priced at once, and the time
+# budget shared by the whole batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_BUDGET_SECONDS = float(os.getenv("BATCH_BUDGET", "60"))
+
+CARS_PATH = "cars.json"
 
 
 # ----------------------------- Data loading -----------------------------
@@ -44,169 +94,138 @@ def load_json(path: str) -> Dict:
         return {}
 
 
-def load_cars_data() -> Dict[str, Dict[str, Dict[str, List[str]]]]:
-    return load_json("cars.json")
-
-
-CARS_DATA = load_cars_data()
+# ----------------------------- Helpers -----------------------------
 
+PUNCTUATION_TABLE = str.maketrans({ch: " " for ch in string.punctuation})
+WHITESPACE_RE = re.compile(r"\s+")
 
-# ----------------------------- Helpers -----------------------------
 
 def normalize_text(value: str) -> str:
-    table = str.maketrans({ch: " " for ch in string.punctuation})
-    return re.sub(r"\s+", " ", value.lower().translate(table)).strip()
+    return WHITESPACE_RE.sub(" ", value.lower().translate(PUNCTUATION_TABLE)).strip()
 
 
-def parse_query_details(query: str) -> Tuple[str, str, str]:
-    car = ""
-    model = ""
-    detail = ""
-    normalized_query = normalize_text(query)
-
-    for car_key in CARS_DATA.keys():
-        if normalize_text(car_key) in normalized_query:
-            car = car_key
-            break
-
-    if car:
-        for model_key in CARS_DATA[car].keys():
-            if normalize_text(model_key) in normalized_query:
-                model = model_key
-                break
+# rebuilt whenever cars.json changes on disk
+CARS_INDEX = ReloadingVehicleIndex(CARS_PATH, normalize_text, load_json)
 
-    if car and model:
-        systems = CARS_DATA.get(car, {}).get(model, {})
-        for part_list in systems.values():
-            for part in part_list:
-                if normalize_text(part) in normalized_query:
-                    detail = part
-                    break
-            if detail:
-                break
 
-    return car, model, detail
+def parse_query_details(query: str) -> Tuple[str, str, str]:
+    return CARS_INDEX.get().parse(query)
 
 
-def clean_price_text(text: str) -> Optional[float]:
-    if not text:
-        return None
-    text = text.replace("to", "-")
-    matches = PRICE_REGEX.findall(text)
-    if not matches:
-        return None
-    number_text = matches[0]
-    number_text = number_text.replace(".", "").replace(",", ".")
-    try:
-        return float(number_text)
-    except ValueError:
-        return None
+# ----------------------------- RRR scraper -----------------------------
 
+def _has_listings(task: asyncio.Task) -> bool:
+    return task.done() and not task.cancelled() and task.exception() is None and bool(task.result())
 
-# ----------------------------- RRR scraper -----------------------------
 
 class RrrScraper:
-    def __init__(self) -> None:
-        self.session = requests.Session()
-
-    def _get(self, url: str) -> Optional[requests.Response]:
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        detail_concurrency: int = DETAIL_CONCURRENCY,
+        detail_budget: float = DETAIL_BUDGET_SECONDS,
+        max_detail_matches: Optional[int] = MAX_DETAIL_MATCHES,
+        speculative: bool = SPECULATIVE_SEARCH,
+        hedge_delay: float = HEDGE_DELAY_SECONDS,
+    ) -> None:
+        self.client = client or get_client()
+        self.detail_concurrency = max(1, detail_concurrency)
+        self.detail_budget = detail_budget
+        self.max_detail_matches = max_detail_matches
+        self.speculative = speculative
+        self.hedge_delay = hedge_delay
+
+    async def _get(self, url: str) -> Optional[httpx.Response]:
         for _ in range(3):
             headers = {"User-Agent": random.choice(USER_AGENTS)}
-            try:
-                response = self.session.get(url, headers=headers, timeout=10)
-                if response.status_code in (429, 503) or "DDOS" in response.text:
-                    time.sleep(random.uniform(0.5, 1.3))
-                    continue
-                response.raise_for_status()
+            response, retry_in = await governed_get(url, headers, self.client)
+            # no retry while the host's circuit is open or its queue is full
+            if response is not None or retry_in is None:
                 return response
-            except requests.RequestException:
-                time.sleep(random.uniform(0.5, 1.3))
-                continue
+            await asyncio.sleep(retry_in)
         return None
 
-    def _parse_item(self, item: BeautifulSoup, base_url: str) -> Optional[Dict]:
-        title_elem = item.select_one(".item-title, .title, [itemprop='name'], .part-name a, a.title")
-        price_elem = item.select_one(
-            ".price, .item-price, .search-item-price, span[itemprop='price']"
-        )
-        image_elem = item.select_one("[itemprop='image'], img")
-        link_elem = item.select_one("[itemprop='url'], a[href*='autodalis'], .part-name a, a")
-
-        price = clean_price_text(price_elem.get_text(" ", strip=True)) if price_elem else None
-        if price is None:
+    async def _parse_listings(self, html: str, target_oem: Optional[str] = None) -> Optional[List[Dict]]:
+        try:
+            return await run_cpu(parse_rrr_listings, html, target_oem)
+        except asyncio.TimeoutError:
+            print("Timed out parsing rrr.lt listings")
             return None
-        link_href = link_elem.get("href") if link_elem else None
-        link = urljoin(base_url, link_href) if link_href else None
-        image = image_elem.get("src") if image_elem else None
-        title = title_elem.get_text(" ", strip=True) if title_elem else None
-
-        return {"title": title, "price": price, "image": image, "link": link}
-
-    def _parse_listings(self, soup: BeautifulSoup, target_oem: Optional[str] = None) -> List[Dict]:
-        containers = soup.select(".search-item, .item, .item-block, .items-box")
-        if not containers:
-            containers = soup.select("article, li, div")
-        results: List[Dict] = []
-        for item in containers:
-            item_text = item.get_text(" ", strip=True)
-            if target_oem and target_oem not in item_text:
-                # allow fuzzy detection of OEM-like strings
-                possible_oems = OEM_PATTERN.findall(item_text)
-                if target_oem not in possible_oems:
-                    continue
-            parsed = self._parse_item(item, "https://rrr.lt")
-            if parsed:
-                results.append(parsed)
-        return results
-
-    def _scrape_detail(self, link: str, target_oem: Optional[str]) -> Optional[Dict]:
-        response = self._get(link)
+
+    async def _scrape_detail(self, link: str, target_oem: Optional[str]) -> Optional[Dict]:
+        response = await self._get(link)
         if not response:
             return None
-        soup = BeautifulSoup(response.text, "lxml")
-        text_blob = soup.get_text(" ", strip=True)
-        if target_oem and target_oem not in text_blob:
-            matches = OEM_PATTERN.findall(text_blob)
-            if target_oem not in matches:
-                return None
-        price_elem = soup.select_one(".price, .item-price, .search-item-price, span[itemprop='price']")
-        price = clean_price_text(price_elem.get_text(" ", strip=True)) if price_elem else None
-        image_elem = soup.select_one("[itemprop='image'], img")
-        image = image_elem.get("src") if image_elem else None
-        if price:
-            return {"title": None, "price": price, "image": image, "link": link}
-        return None
+        try:
+            return await run_cpu(parse_rrr_detail, response.text, link, target_oem)
+        except (PoolSaturated, asyncio.TimeoutError):
+            # enrichment is best effort: a busy pool leaves this page out
+            # rather than failing the search
+            print("Could not parse rrr.lt detail page", link)
+            return None
 
-    def search_direct(self, oem: str) -> List[Dict]:
-        url = f"https://rrr.lt/paieska/?q={quote(oem)}"
-        response = self._get(url)
+    # Search strategies return None when rrr.lt could not be asked or its
+    # page could not be parsed, and [] when it answered without listings.
+
+    async def search_direct(self, oem: str) -> Optional[List[Dict]]:
+        url = f"{RRR_BASE_URL}/paieska/?q={quote(oem)}"
+        response = await self._get(url)
         if not response:
-            return []
-        soup = BeautifulSoup(response.text, "lxml")
-        results = self._parse_listings(soup, target_oem=oem)
-        detailed: List[Dict] = []
-        for res in results:
-            if res.get("link"):
-                enriched = self._scrape_detail(res["link"], oem)
-                if enriched:
-                    detailed.append(enriched)
+            return None
+        results = await self._parse_listings(response.text, target_oem=oem)
+        if results is None:
+            return None
+        detailed = await self._enrich_details([res["link"] for res in results if res.get("link")], oem)
         return detailed or results
 
-    def search_substring(self, oem: str) -> List[Dict]:
+    async def _enrich_details(self, links: List[str], oem: str) -> List[Dict]:
+        # detail pages are scraped concurrently; whatever is confirmed when the
+        # budget runs out (or once enough matches are found) is returned in link order
+        if not links:
+            return []
+        semaphore = asyncio.Semaphore(self.detail_concurrency)
+
+        async def scrape(link: str) -> Optional[Dict]:
+            async with semaphore:
+                return await self._scrape_detail(link, oem)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.detail_budget
+        index: Dict[asyncio.Task, int] = {}
+        for position, link in enumerate(links):
+            index[asyncio.create_task(scrape(link))] = position
+        pending: Set[asyncio.Task] = set(index)
+        enriched: Dict[int, Dict] = {}
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result:
+                        enriched[index[task]] = result
+                if self.max_detail_matches and len(enriched) >= self.max_detail_matches:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return [enriched[position] for position in sorted(enriched)]
+
+    async def search_substring(self, oem: str) -> Optional[List[Dict]]:
         if len(oem) < 5:
             return []
         partial = oem[:5]
-        url = f"https://rrr.lt/paieska/?q={quote(partial)}"
-        response = self._get(url)
+        url = f"{RRR_BASE_URL}/paieska/?q={quote(partial)}"
+        response = await self._get(url)
         if not response:
-            return []
-        soup = BeautifulSoup(response.text, "lxml")
-        found: List[Dict] = []
-        for item in self._parse_listings(soup, target_oem=oem):
-            found.append(item)
-        return found
+            return None
+        return await self._parse_listings(response.text, target_oem=oem)
 
-    def search_translated(self, detail: str) -> List[Dict]:
+    async def search_translated(self, detail: str) -> Optional[List[Dict]]:
         translations = {
             "oil filter housing": "Tepalo filtro laikiklis",
             "oil cooler": "Alyvos aušintuvas",
@@ -219,104 +238,314 @@ class RrrScraper:
         normalized_detail = normalize_text(detail)
         for key, translated in translations.items():
             if key in normalized_detail:
-                response = self._get(f"https://rrr.lt/paieska/?q={quote(translated)}")
+                response = await self._get(f"{RRR_BASE_URL}/paieska/?q={quote(translated)}")
                 if not response:
-                    return []
-                soup = BeautifulSoup(response.text, "lxml")
-                return self._parse_listings(soup)
+                    return None
+                return await self._parse_listings(response.text)
         return []
 
-    def search_keywords(self, query: str) -> List[Dict]:
+    async def search_keywords(self, query: str) -> Optional[List[Dict]]:
         normalized = normalize_text(query)
         short_keywords = " ".join(normalized.split()[:3])
-        url = f"https://rrr.lt/paieska/?q={quote(short_keywords)}"
-        response = self._get(url)
+        url = f"{RRR_BASE_URL}/paieska/?q={quote(short_keywords)}"
+        response = await self._get(url)
         if not response:
-            return []
-        soup = BeautifulSoup(response.text, "lxml")
-        return self._parse_listings(soup)
+            return None
+        return await self._parse_listings(response.text)
 
-    def search(self, oem: str, detail: str, query: str) -> List[Dict]:
+    async def search(self, oem: str, detail: str, query: str) -> Optional[List[Dict]]:
+        # the first strategy with listings wins; None when none had any and
+        # at least one of them could not ask rrr.lt
         strategies = [
             lambda: self.search_direct(oem),
             lambda: self.search_substring(oem),
             lambda: self.search_translated(detail or query),
             lambda: self.search_keywords(query),
         ]
+        if self.speculative:
+            return await self._search_hedged(strategies)
+        failed = False
         for strategy in strategies:
-            results = strategy()
+            results = await strategy()
             if results:
                 return results
-        return []
-
-    def search_text(self, query: str) -> List[Dict]:
-        return self.search_keywords(query)
+            failed = failed or results is None
+        return None if failed else []
+
+    async def _search_hedged(self, strategies: List) -> Optional[List[Dict]]:
+        # each strategy starts hedge_delay after the previous one, or as soon as
+        # the previous one misses; results are still taken in priority order
+        tasks: List[asyncio.Task] = []
+        started = [asyncio.Event() for _ in strategies]
+
+        async def staggered(position: int) -> Optional[List[Dict]]:
+            if position:
+                await started[position - 1].wait()
+                await asyncio.wait({tasks[position - 1]}, timeout=self.hedge_delay)
+                if any(_has_listings(task) for task in tasks[:position]):
+                    # a higher-priority strategy already produced listings
+                    started[position].set()
+                    return []
+            started[position].set()
+            return await strategies[position]()
+
+        for position in range(len(strategies)):
+            tasks.append(asyncio.create_task(staggered(position)))
+        failed = False
+        try:
+            for task in tasks:
+                results = await task
+                if results:
+                    return results
+                failed = failed or results is None
+            return None if failed else []
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def search_text(self, query: str) -> Optional[List[Dict]]:
+        return await self.search_keywords(query)
 
 
 # ----------------------------- eBay scraper -----------------------------
 
-def fetch_ebay(search_term: str) -> List[Dict]:
-    url = f"https://www.ebay.de/sch/i.html?_nkw={quote(search_term)}"
+async def fetch_ebay(search_term: str, client: Optional[httpx.AsyncClient] = None) -> Optional[List[Dict]]:
+    # None when eBay could not be asked or its page could not be parsed
+    url = f"{EBAY_BASE_URL}/sch/i.html?_nkw={quote(search_term)}"
+    response, _ = await governed_get(url, {"User-Agent": random.choice(USER_AGENTS)}, client)
+    if response is None:
+        return None
     try:
-        response = requests.get(url, headers={"User-Agent": random.choice(USER_AGENTS)}, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException:
-        return []
-    soup = BeautifulSoup(response.text, "lxml")
-    items = soup.select(".s-item")
-    results: List[Dict] = []
-    for item in items:
-        price_elem = item.select_one(".s-item__price, span[itemprop='price']")
-        price = clean_price_text(price_elem.get_text(" ", strip=True)) if price_elem else None
-        if price is None:
-            continue
-        image_elem = item.select_one(".s-item__image-img")
-        link_elem = item.select_one(".s-item__link")
-        link = link_elem.get("href") if link_elem else None
-        image = image_elem.get("src") if image_elem else None
-        results.append({"title": None, "price": price, "image": image, "link": link})
-    return results
+        return await run_cpu(parse_ebay_listings, response.text)
+    except asyncio.TimeoutError:
+        print("Timed out parsing eBay listings")
+        return None
 
 
-# ----------------------------- Logging -----------------------------
+# ----------------------------- Candidate search -----------------------------
 
-def log_request(part_number: str, prices: List[float], final_price: float) -> None:
-    timestamp = datetime.utcnow().isoformat()
-    path = os.path.join("data", "part_logs.csv")
-    file_exists = os.path.exists(path)
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+_candidate_flights = SingleFlight()
+_query_flights = SingleFlight()
+# progress of each coalesced query, for every streaming caller waiting on it
+_query_progress = Broadcast()
 
-    min_price = min(prices) if prices else None
-    max_price = max(prices) if prices else None
-    avg_price = sum(prices) / len(prices) if prices else None
-    count = len(prices)
+# receives progress events (name, data) from a search as they happen
+Progress = Callable[[str, Dict], None]
 
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow(["timestamp", "part_number", "min_price", "max_price", "avg_price", "final_price", "count"])
-        writer.writerow([timestamp, part_number, min_price, max_price, avg_price, final_price, count])
 
+def result_sources(outcome: Dict) -> List[str]:
+    return [source for source in ("rrr", "ebay") if outcome.get(source)]
 
-# ----------------------------- FastAPI routes -----------------------------
 
+def priced_offers(results: List[Dict]) -> Tuple[List[float], List[Optional[str]]]:
+    # prices of the listings that have one, and the marketplace of each
+    offers = [item for item in results if isinstance(item.get("price"), (int, float))]
+    return [item["price"] for item in offers], [item.get("source") for item in offers]
 
-@app.get("/", response_class=HTMLResponse)
-async def read_index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+
+def cache_outcome(outcome: Dict) -> bool:
+    # False when none of the listings had a price, so nothing was cached
+    results = outcome["results"]
+    prices, price_sources = priced_offers(results)
+    if not prices:
+        return False
+    photo = next((item["image"] for item in results if item.get("image")), None)
+    save_scrape_result(outcome["oem"], prices, photo, result_sources(outcome), price_sources)
+    return True
+
+
+async def report_listings(
+    search: Awaitable[Optional[List[Dict]]], source: str, oem: Optional[str], progress: Optional[Progress]
+) -> Optional[List[Dict]]:
+    results = await search
+    for item in results or []:
+        # pricing weighs offers by marketplace
+        item["source"] = source
+    if progress and results:
+        progress("listings", {"source": source, "oem": oem, "offers": results})
+    return results
 
 
-@app.get("/cars.json")
-async def serve_cars():
-    return FileResponse("cars.json")
+async def scrape_listings(
+    scraper: RrrScraper, candidate: str, detail: str, query: str, progress: Optional[Progress] = None
+) -> Tuple[Optional[List[Dict]], Optional[List[Dict]]]:
+    # (rrr.lt, eBay) listings; None for a marketplace that could not be asked
+    rrr_results, ebay_results = await asyncio.gather(
+        report_listings(scraper.search(candidate, detail, query), "rrr", candidate, progress),
+        report_listings(fetch_ebay(candidate, scraper.client), "ebay", candidate, progress),
+    )
+    return rrr_results, ebay_results
 
 
-@app.get("/api/part", response_class=JSONResponse)
-async def get_part(q: str = Query(..., min_length=1)):
-    search_term = q.strip()
+def candidate_outcome(
+    candidate: str, rrr_results: Optional[List[Dict]], ebay_results: Optional[List[Dict]]
+) -> Optional[Dict]:
+    if not rrr_results and not ebay_results:
+        return None
+    rrr_results, ebay_results = rrr_results or [], ebay_results or []
+    return {
+        "oem": candidate,
+        "results": rrr_results + ebay_results,
+        "rrr": rrr_results,
+        "ebay": ebay_results,
+        "cache_used": False,
+    }
+
+
+def answered_empty(rrr_results: Optional[List[Dict]], ebay_results: Optional[List[Dict]]) -> bool:
+    # both marketplaces were asked and neither had listings; a failed fetch
+    # or a host failing fast says nothing about the OEM itself
+    return rrr_results == [] and ebay_results == [] and not any_tripped()
+
+
+async def scrape_candidate(
+    scraper: RrrScraper, candidate: str, detail: str, query: str, progress: Optional[Progress] = None
+) -> Optional[Dict]:
+    return candidate_outcome(candidate, *await scrape_listings(scraper, candidate, detail, query, progress))
+
+
+async def refresh_candidate(candidate: str, detail: str, query: str) -> None:
+    # a failed refresh keeps serving the stale entry until it ages out
+    outcome = await scrape_candidate(RrrScraper(), candidate, detail, query)
+    if outcome:
+        cache_outcome(outcome)
+
+
+async def warm_candidate(oem: str, client: httpx.AsyncClient) -> Optional[bool]:
+    # cache warmer: scrape a hot OEM ahead of expiry on the warmer's client.
+    # A miss both marketplaces answered is cached as negative, so the part is
+    # not due again until that entry expires.
+    if oem in _refresh_tasks:
+        return True
+    rrr_results, ebay_results = await scrape_listings(RrrScraper(client), oem, "", oem)
+    outcome = candidate_outcome(oem, rrr_results, ebay_results)
+    if outcome and cache_outcome(outcome):
+        return True
+    if outcome or answered_empty(rrr_results, ebay_results):
+        save_negative_result(oem)
+        return False
+    return None
+
+
+def schedule_refresh(candidate: str, detail: str, query: str) -> None:
+    if candidate in _refresh_tasks:
+        return
+    task = asyncio.create_task(refresh_candidate(candidate, detail, query))
+    _refresh_tasks[candidate] = task
+    task.add_done_callback(lambda done: _refresh_done(candidate, done))
+
+
+def _refresh_done(candidate: str, task: asyncio.Task) -> None:
+    _refresh_tasks.pop(candidate, None)
+    # nobody awaits the refresh, so its failures are only seen here
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background refresh of {candidate} failed:", repr(task.exception()))
+
+
+async def search_candidate(
+    scraper: RrrScraper,
+    candidate: str,
+    detail: str,
+    query: str,
+    prefetched: Optional[Dict[str, Dict]] = None,
+    progress: Optional[Progress] = None,
+) -> Optional[Dict]:
+    # prefetched holds entries read in bulk; misses are re-checked since another
+    # search may have filled them in the meantime
+    cached = (prefetched or {}).get(candidate) or get_cached(candidate, allow_stale=True)
+    if cached and cached.get("negative"):
+        return None
+    if not (cached and cached.get("prices")) and any_tripped():
+        # a marketplace is failing fast; old offers beat no offers
+        cached = get_cached(candidate, allow_stale=True, any_age=True)
+    if cached and cached.get("prices"):
+        if cached["stale"]:
+            schedule_refresh(candidate, detail, query)
+        prices = cached["prices"]
+        # entries cached before sources were stored weigh every offer alike
+        sources = cached.get("price_sources") or []
+        if len(sources) != len(prices):
+            sources = [None] * len(prices)
+        results = [
+            {"price": price, "source": source, "image": cached.get("image"), "link": None, "title": None}
+            for price, source in zip(prices, sources)
+        ]
+        if progress:
+            progress("cache", {"oem": candidate, "stale": cached["stale"], "offers": results})
+        return {"oem": candidate, "results": results, "rrr": [], "ebay": [], "cache_used": True}
+
+    rrr_results, ebay_results = await scrape_listings(scraper, candidate, detail, query, progress)
+    if answered_empty(rrr_results, ebay_results):
+        save_negative_result(candidate)
+    return candidate_outcome(candidate, rrr_results, ebay_results)
+
+
+async def race_candidates(
+    scraper: RrrScraper,
+    candidates: List[str],
+    detail: str,
+    query: str,
+    prefetched: Optional[Dict[str, Dict]] = None,
+    progress: Optional[Progress] = None,
+) -> Optional[Dict]:
+    queue = [candidate.strip() for candidate in candidates if candidate.strip()]
+    rank: Dict[asyncio.Task, int] = {}
+    running: Set[asyncio.Task] = set()
+    try:
+        while queue or running:
+            while queue and len(running) < CANDIDATE_FANOUT:
+                candidate = queue.pop(0)
+                task = asyncio.create_task(
+                    _candidate_flights.do(
+                        candidate,
+                        lambda candidate=candidate: search_candidate(
+                            scraper, candidate, detail, query, prefetched, progress
+                        ),
+                    )
+                )
+                # a joined flight reports progress only to the caller that started it
+                rank[task] = len(rank)
+                running.add(task)
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            # when several finish together, prefer the better-ranked candidate
+            for task in sorted(done, key=rank.__getitem__):
+                outcome = task.result()
+                if outcome:
+                    return outcome
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    return None
+
+
+QueryContext = Tuple[str, str, str, List[str]]
+
+
+async def resolve_query(search_term: str) -> QueryContext:
     car, model, detail = parse_query_details(search_term)
     print("Resolved query context:", car, model, detail)
-    oem_candidates = resolve_oem(car, model, detail, search_term)
+    oem_candidates = await resolve_oem_async(car, model, detail, search_term)
+    return car, model, detail, oem_candidates
+
+
+async def collect_offers(
+    search_term: str,
+    context: Optional[QueryContext] = None,
+    prefetched: Optional[Dict[str, Dict]] = None,
+    progress: Optional[Progress] = None,
+) -> Dict:
+    # Finds the offers for a search and caches what was scraped. Quoting is
+    # left to the caller (see search_payload), so a batch can price many
+    # searches in one pass.
+    car, model, detail, oem_candidates = context or await resolve_query(search_term)
+    if progress:
+        progress("candidates", {"car": car, "model": model, "detail": detail, "oem_candidates": oem_candidates})
 
     scraper = RrrScraper()
     combined_results: List[Dict] = []
@@ -335,71 +564,39 @@ async def get_part(q: str = Query(..., min_length=1)):
             if first_link:
                 internal_links.append({"source": "ebay", "url": first_link})
 
-    # try OEM candidates
-    for candidate in oem_candidates:
-        candidate = candidate.strip()
-        if not candidate:
-            continue
-
-        cached = get_cached(candidate)
-        if cached and cached.get("prices"):
-            cache_used = True
-            resolved_oem = candidate
-            combined_results.extend(
-                [{"price": p, "image": cached.get("image"), "link": None, "title": None} for p in cached.get("prices", [])]
-            )
-            break
-
-        rrr_results = scraper.search(candidate, detail, search_term)
-        ebay_results = fetch_ebay(candidate)
-        add_links(rrr_results, ebay_results)
-        candidate_results = rrr_results + ebay_results
-        if candidate_results:
-            resolved_oem = candidate
-            combined_results.extend(candidate_results)
+    # race OEM candidates
+    outcome = await race_candidates(scraper, oem_candidates, detail, search_term, prefetched, progress)
+    if outcome:
+        resolved_oem = outcome["oem"]
+        combined_results.extend(outcome["results"])
+        cache_used = outcome["cache_used"]
+        if not cache_used:
+            add_links(outcome["rrr"], outcome["ebay"])
             catalog_hit = True if get_known_oems(car, model, detail) else False
-            break
 
     # fallback to natural text
     if not combined_results:
-        rrr_results = scraper.search_text(search_term)
-        ebay_results = fetch_ebay(search_term)
+        rrr_results, ebay_results = await asyncio.gather(
+            report_listings(scraper.search_text(search_term), "rrr", None, progress),
+            report_listings(fetch_ebay(search_term), "ebay", None, progress),
+        )
+        rrr_results, ebay_results = rrr_results or [], ebay_results or []
         add_links(rrr_results, ebay_results)
         combined_results.extend(rrr_results + ebay_results)
 
-    prices = [item["price"] for item in combined_results if isinstance(item.get("price"), (int, float))]
-
-    if not prices:
-        return JSONResponse(
-            {
-                "error": "No offers found",
-                "oem_candidates": oem_candidates,
-                "resolved_oem": resolved_oem,
-                "raw_prices": prices,
-                "internal_links": internal_links,
-                "catalog_hit": catalog_hit,
-                "cache_used": cache_used,
-            }
-        )
-
-    avg_price = sum(prices) / len(prices)
-    final_price = round(avg_price * 1.35, 2)
-
-    photo = None
-    for item in combined_results:
-        if item.get("image"):
-            photo = item["image"]
-            break
+    prices, price_sources = priced_offers(combined_results)
+    photo = next((item["image"] for item in combined_results if item.get("image")), None)
 
-    if resolved_oem:
-        save_scrape_result(resolved_oem, prices, photo)
+    # only offers the pricing engine can use (positive prices) are worth keeping
+    if resolved_oem and any(price > 0 for price in prices):
+        # cached offers keep their original expiry so stale entries get refreshed
+        if not cache_used:
+            save_scrape_result(resolved_oem, prices, photo, result_sources(outcome), price_sources)
         if car and model and detail:
             save_new_oem(car, model, detail, resolved_oem)
 
-    log_request(resolved_oem or search_term, prices, final_price)
-
     return {
-        "final_price": final_price,
+        "offers": combined_results,
         "photo": photo,
         "oem_candidates": oem_candidates,
         "resolved_oem": resolved_oem,
@@ -410,6 +607,261 @@ async def get_part(q: str = Query(..., min_length=1)):
     }
 
 
+def search_payload(found: Dict, final_price: Optional[float]) -> Dict:
+    # the /api/part response for the offers collect_offers found
+    payload = {
+        "oem_candidates": found["oem_candidates"],
+        "resolved_oem": found["resolved_oem"],
+        "raw_prices": found["raw_prices"],
+        "internal_links": found["internal_links"],
+        "catalog_hit": found["catalog_hit"],
+        "cache_used": found["cache_used"],
+    }
+    if final_price is None:
+        return {"error": "No offers found", **payload}
+    return {"final_price": final_price, "photo": found["photo"], **payload}
+
+
+async def coalesced_offers(
+    key: str,
+    search_term: str,
+    context: Optional[QueryContext] = None,
+    prefetched: Optional[Dict[str, Dict]] = None,
+    progress: Optional[Progress] = None,
+) -> Dict:
+    # collect_offers shared by identical searches in flight; progress, when
+    # given, receives the shared search's events, including those sent before
+    # this caller joined
+    if progress:
+        _query_progress.subscribe(key, progress)
+    try:
+        return await _query_flights.do(
+            key,
+            lambda: _query_progress.run(
+                key, lambda publish: collect_offers(search_term, context, prefetched, publish)
+            ),
+        )
+    finally:
+        if progress:
+            _query_progress.unsubscribe(key, progress)
+
+
+# ----------------------------- Batch pricing -----------------------------
+
+def dedupe_queries(items: List[str]) -> Dict[str, Tuple[str, List[int]]]:
+    # normalized query -> (first spelling, positions in the request)
+    groups: Dict[str, Tuple[str, List[int]]] = {}
+    for position, item in enumerate(items):
+        term = item.strip()
+        if term:
+            groups.setdefault(normalize_text(term) or term, (term, []))[1].append(position)
+    return groups
+
+
+def batch_error(error: BaseException) -> Dict:
+    if isinstance(error, PoolSaturated):
+        return {"error": "Server busy, please retry"}
+    if isinstance(error, asyncio.TimeoutError):
+        return {"error": "Batch time budget exhausted"}
+    print("Batch item failed:", repr(error))
+    return {"error": "Search failed"}
+
+
+async def price_batch(items: List[str]) -> AsyncIterator[Dict]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + BATCH_BUDGET_SECONDS
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    groups = dedupe_queries(items)
+    log_rows: List[Tuple[str, List[float], float]] = []
+    tasks: List[asyncio.Task] = []
+
+    async def within_budget(factory: Callable[[], Awaitable]):
+        async with slots:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(factory(), remaining)
+
+    def line(key: str, payload: Dict) -> Dict:
+        term, positions = groups[key]
+        return {"query": term, "positions": positions, **payload}
+
+    try:
+        keys = list(groups)
+        contexts = await asyncio.gather(
+            *(within_budget(lambda term=groups[key][0]: resolve_query(term)) for key in keys),
+            return_exceptions=True,
+        )
+        resolved: Dict[str, QueryContext] = {}
+        for key, context in zip(keys, contexts):
+            if isinstance(context, BaseException):
+                yield line(key, batch_error(context))
+            else:
+                resolved[key] = context
+
+        # one cache read covering every candidate of every item
+        candidates = {oem.strip() for context in resolved.values() for oem in context[3] if oem.strip()}
+        prefetched = get_cached_many(list(candidates), allow_stale=True)
+
+        async def search(key: str, context: QueryContext) -> Tuple[str, Optional[Dict], Optional[Dict]]:
+            # (key, offers found, error payload)
+            term = groups[key][0]
+            try:
+                # shares work with identical single searches running meanwhile
+                found = await within_budget(lambda: coalesced_offers(key, term, context, prefetched))
+            except Exception as error:
+                return key, None, batch_error(error)
+            return key, found, None
+
+        tasks = [asyncio.create_task(search(key, context)) for key, context in resolved.items()]
+        pending: Set[asyncio.Task] = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished = [task.result() for task in done]
+            searched = [(key, found) for key, found, _ in finished if found is not None]
+            # the searches that finished together are priced in one vectorized pass
+            quotes = quote_offers([found["offers"] for _, found in searched])
+            for (key, found), final_price in zip(searched, quotes):
+                payload = search_payload(found, final_price)
+                if "error" not in payload:
+                    part_number = payload["resolved_oem"] or groups[key][0]
+                    log_rows.append((part_number, payload["raw_prices"], payload["final_price"]))
+                yield line(key, payload)
+            for key, _, error in finished:
+                if error is not None:
+                    yield line(key, error)
+    finally:
+        for task in tasks:
+            task.cancel()
+        log_requests(log_rows)
+
+
+# ----------------------------- Streaming search -----------------------------
+
+async def part_events(search_term: str) -> AsyncIterator[Dict]:
+    # progress events of the search, ending with "result", which carries the
+    # /api/part payload. Joins an identical search already in flight.
+    events: asyncio.Queue = asyncio.Queue()
+    # set once the consumer is gone (client disconnected or stream finished)
+    closed = False
+
+    def progress(event: str, data: Dict) -> None:
+        events.put_nowait({"event": event, "data": data})
+
+    async def run() -> None:
+        # always ends the stream with a "result" event while anyone listens
+        payload: Dict = {"error": "Search failed"}
+        try:
+            found = await coalesced_offers(normalize_text(search_term), search_term, progress=progress)
+            payload = search_payload(found, quote_price(found["offers"]))
+        except asyncio.CancelledError:
+            if closed:
+                raise
+            # the shared search was cancelled by the caller that owned it
+            payload = {"error": "Search cancelled, please retry"}
+        except (PoolSaturated, asyncio.TimeoutError):
+            payload = {"error": "Server busy, please retry"}
+        except Exception as error:
+            print("Streaming search failed:", repr(error))
+        finally:
+            if not closed:
+                if "error" not in payload:
+                    log_request(
+                        payload["resolved_oem"] or search_term, payload["raw_prices"], payload["final_price"]
+                    )
+                progress("result", payload)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            yield event
+            if event["event"] == "result":
+                break
+    finally:
+        closed = True
+        task.cancel()
+
+
+async def sse_messages(events: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    async for event in events:
+        yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+# ----------------------------- FastAPI routes -----------------------------
+
+
+@app.get("/", response_class=HTMLResponse)
+async def read_index(request: Request):
+    return templates.TemplateResponse("index.html", {"request": request})
+
+
+@app.get("/cars.json")
+async def serve_cars():
+    return FileResponse(CARS_PATH)
+
+
+@app.get("/api/part", response_class=JSONResponse)
+async def get_part(q: str = Query(..., min_length=1)):
+    search_term = q.strip()
+    # identical concurrent searches share one resolver run and scrape
+    try:
+        found = await coalesced_offers(normalize_text(search_term), search_term)
+    except (PoolSaturated, asyncio.TimeoutError):
+        return JSONResponse({"error": "Server busy, please retry"}, status_code=503)
+    # outliers (mis-parsed or mislisted offers) are filtered before the markup
+    payload = search_payload(found, quote_price(found["offers"]))
+    if "error" in payload:
+        return JSONResponse(payload)
+
+    log_request(payload["resolved_oem"] or search_term, payload["raw_prices"], payload["final_price"])
+    return payload
+
+
+async def ndjson_lines(lines: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    async for line in lines:
+        yield json.dumps(line) + "\n"
+
+
+@app.post("/api/parts")
+async def get_parts(items: List[str] = Body(..., embed=True)):
+    # one NDJSON line per distinct query, in completion order, with the fields
+    # /api/part returns plus "query" and its "positions" in the request
+    if not any(item.strip() for item in items) or len(items) > BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"Send between 1 and {BATCH_MAX_ITEMS} items"}, status_code=400)
+    return StreamingResponse(ndjson_lines(price_batch(items)), media_type="application/x-ndjson")
+
+
+@app.get("/api/analytics")
+async def get_analytics(
+    part: Optional[str] = None,
+    window: str = "7D",
+    days: Optional[int] = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+):
+    # per-part demand, rolling prices over `window` and price trend from the request logs
+    try:
+        return await run_cpu(part_analytics, part, window, days, limit, timeout=ANALYTICS_TIMEOUT)
+    except ValueError:
+        return JSONResponse({"error": f"Invalid window: {window}"}, status_code=400)
+    except (PoolSaturated, asyncio.TimeoutError):
+        return JSONResponse({"error": "Server busy, please retry"}, status_code=503)
+
+
+@app.get("/api/part/stream")
+async def stream_part(
+    q: str = Query(..., min_length=1),
+    stream_format: str = Query("sse", alias="format", pattern="^(sse|ndjson)$"),
+):
+    # candidates, cache hits and each source's listings as they arrive, then
+    # the final "result"; Server-Sent Events by default, NDJSON on request
+    events = part_events(q.strip())
+    if stream_format == "ndjson":
+        return StreamingResponse(ndjson_lines(events), media_type="application/x-ndjson")
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(sse_messages(events), media_type="text/event-stream", headers=headers)
+
+
 if __name__ == "__main__":
     import uvicorn
 
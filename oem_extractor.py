@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+OEM_REGEX = re.compile(
+    r"\b(?:(?:\d{10,12})|(?:0[36][A-Z]\d{6,7}[A-Z]?)|(?:\d[A-Z]\d{6,8})|(?:[0-9]{2}[A-Z0-9]{6,8}))\b",
+    re.IGNORECASE,
+)
+
+PREFIX_HINT_PATTERNS = [
+    re.compile(r"\b(?:11\d{8,10}|13\d{8,10}|17\d{8,10})\b", re.IGNORECASE),
+    re.compile(r"\b(?:03L|06H|8K0)[A-Z0-9]{5,8}\b", re.IGNORECASE),
+    re.compile(r"\b(?:96|98|19)\d{6,8}\b", re.IGNORECASE),
+    re.compile(r"\b31\d{2,8}\b", re.IGNORECASE),
+]
+
+# one tag per pattern, in the order extract_oems reports them; the hint tags
+# are named after the makes whose part numbers use those prefixes
+PATTERNS: List[Tuple[str, re.Pattern]] = [("oem", OEM_REGEX)] + list(
+    zip(("bmw", "vag", "psa", "volvo"), PREFIX_HINT_PATTERNS)
+)
+TAGS = [tag for tag, _ in PATTERNS]
+
+# Every pattern is anchored by \b on both ends and only matches
+# [0-9A-Z] characters, so a match is always a whole word starting with a
+# digit and 4-12 characters long. One scan collects exactly those words; each
+# distinct word is then classified once against the patterns.
+CANDIDATE_REGEX = re.compile(r"\b\d[\dA-Z]{3,11}\b", re.IGNORECASE)
+WORD_TAIL_RE = re.compile(r"\w*\Z")
+TOKEN_CACHE_SIZE = 65536
+
+OemMatch = Tuple[str, Tuple[str, ...]]
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def classify(token: str) -> Tuple[str, ...]:
+    # tags of every pattern the word matches (empty for prices, years, ...)
+    return tuple(tag for tag, pattern in PATTERNS if pattern.fullmatch(token))
+
+
+def scan(text: str) -> Iterator[OemMatch]:
+    # OEM-like words in text order, with their pattern tags
+    for match in CANDIDATE_REGEX.finditer(text):
+        token = match.group()
+        tags = classify(token)
+        if tags:
+            yield token, tags
+
+
+class OemScanner:
+    # Streaming scan over text arriving in chunks: a word cut by a chunk
+    # boundary is held back until the next chunk completes it.
+
+    def __init__(self) -> None:
+        self._tail = ""
+
+    def feed(self, chunk: str) -> List[OemMatch]:
+        text = self._tail + chunk
+        cut = WORD_TAIL_RE.search(text).start()
+        self._tail = text[cut:]
+        return list(scan(text[:cut]))
+
+    def close(self) -> List[OemMatch]:
+        text, self._tail = self._tail, ""
+        return list(scan(text))
+
+
+def scan_chunks(chunks: Iterable[str]) -> Iterator[OemMatch]:
+    scanner = OemScanner()
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
+
+
+def group_by_tag(matches: Iterable[OemMatch]) -> Dict[str, List[str]]:
+    grouped: Dict[str, List[str]] = {tag: [] for tag in TAGS}
+    for token, tags in matches:
+        for tag in tags:
+            grouped[tag].append(token)
+    return grouped
+
+
+def extract_oems(text: str) -> List[str]:
+    # Same list (duplicates included) as running OEM_REGEX and then each
+    # prefix hint pattern over the text with findall, from a single scan.
+    grouped = group_by_tag(scan(text))
+    return [token for tag in TAGS for token in grouped[tag]]
@@ -1,15 +1,25 @@
+import asyncio
 import json
 import os
 import re
 import string
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
 from urllib.parse import quote
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
 from rapidfuzz import fuzz, process
 
-from catalog_manager import get_known_oems
+from catalog_manager import add_oem_listener, get_keyword_oems, get_known_oems, save_keyword_oems
+from listing_parser import RRR_BASE_URL, element_text, parse_html
+from oem_extractor import extract_oems
+from singleflight import SingleFlight
+from text_matchers import AhoCorasick
+from traffic_governor import governed_get
+from worker_pool import PoolSaturated, run_cpu
 
 STOPWORDS = {
     "bmw",
@@ -79,19 +89,6 @@ KEYWORD_OEM_MAP: Dict[str, List[str]] = {
     "ventilateur": ["31429982", "31429982"],
 }
 
-OEM_REGEX = re.compile(
-    r"\b(?:(?:\d{10,12})|(?:0[36][A-Z]\d{6,7}[A-Z]?)|(?:\d[A-Z]\d{6,8})|(?:[0-9]{2}[A-Z0-9]{6,8}))\b",
-    re.IGNORECASE,
-)
-
-PREFIX_HINT_PATTERNS = [
-    re.compile(r"\b(?:11\d{8,10}|13\d{8,10}|17\d{8,10})\b", re.IGNORECASE),
-    re.compile(r"\b(?:03L|06H|8K0)[A-Z0-9]{5,8}\b", re.IGNORECASE),
-    re.compile(r"\b(?:96|98|19)\d{6,8}\b", re.IGNORECASE),
-    re.compile(r"\b31\d{2,8}\b", re.IGNORECASE),
-]
-
-
 def load_lookup(file_name: str) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
     path = os.path.join(os.path.dirname(__file__), file_name)
     try:
@@ -104,11 +101,21 @@ def load_lookup(file_name: str) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
 LOOKUP_DATA = load_lookup("oem_lookup.json")
 CATALOG_DATA = load_lookup("oem_catalog.json")
 
+BEST_KEY_THRESHOLD = 80
+LOOKUP_CACHE_SIZE = int(os.getenv("OEM_LOOKUP_CACHE_SIZE", "4096"))
+# resolved candidate lists per normalized query; 0 disables the cache
+RESOLVE_CACHE_SIZE = int(os.getenv("OEM_RESOLVE_CACHE_SIZE", "2048"))
+RESOLVE_CACHE_TTL = float(os.getenv("OEM_RESOLVE_CACHE_TTL", "900"))
+# total time the keyword fallback may spend scraping rrr.lt
+KEYWORD_SCRAPE_BUDGET = float(os.getenv("OEM_KEYWORD_SCRAPE_BUDGET", "4"))
+
+
+PUNCTUATION_TABLE = str.maketrans({ch: " " for ch in string.punctuation})
+WHITESPACE_RE = re.compile(r"\s+")
+
 
 def normalize(text: str) -> str:
-    lowered = text.lower()
-    table = str.maketrans({ch: " " for ch in string.punctuation})
-    return re.sub(r"\s+", " ", lowered.translate(table)).strip()
+    return WHITESPACE_RE.sub(" ", text.lower().translate(PUNCTUATION_TABLE)).strip()
 
 
 def dedupe_preserve(seq: List[str]) -> List[str]:
@@ -127,7 +134,7 @@ def best_key(options: List[str], value: str) -> Optional[str]:
     if not options or not value:
         return None
     match = process.extractOne(value, options, scorer=fuzz.partial_ratio)
-    if match and match[1] >= 80:
+    if match and match[1] >= BEST_KEY_THRESHOLD:
         return match[0]
     for opt in options:
         if normalize(opt) == normalize(value):
@@ -153,49 +160,174 @@ def lookup_from_table(car: str, model: str, detail: str, table: Dict[str, Dict[s
     return candidates
 
 
+class KeyLevel:
+    # One level (car, model or detail) of a seeded table, compiled for
+    # best_key: the key list is built once, values that are themselves keys
+    # map straight to the key best_key would pick, and the normalized-equality
+    # fallback is a dict lookup.
+
+    def __init__(self, mapping: Dict, depth: int) -> None:
+        self.mapping = mapping if isinstance(mapping, dict) else {}
+        self.keys = list(self.mapping)
+        self.by_normalized: Dict[str, str] = {}
+        for key in self.keys:
+            self.by_normalized.setdefault(normalize(key), key)
+        # an earlier key containing the value also scores 100 and wins the tie,
+        # so exact hits are resolved with the same extractOne call up front
+        self.exact = {
+            key: process.extractOne(key, self.keys, scorer=fuzz.partial_ratio)[0] for key in self.keys
+        }
+        self.children: Dict[str, KeyLevel] = {}
+        if depth > 1:
+            self.children = {key: KeyLevel(value, depth - 1) for key, value in self.mapping.items()}
+
+    def best_key(self, value: str) -> Optional[str]:
+        if not self.keys or not value:
+            return None
+        hit = self.exact.get(value)
+        if hit is not None:
+            return hit
+        match = process.extractOne(value, self.keys, scorer=fuzz.partial_ratio, score_cutoff=BEST_KEY_THRESHOLD)
+        if match:
+            return match[0]
+        return self.by_normalized.get(normalize(value))
+
+
+class LookupIndex:
+    # lookup_from_table over a table compiled at load time, memoized per
+    # (car, model, detail)
+
+    def __init__(self, table: Dict[str, Dict[str, Dict[str, List[str]]]]) -> None:
+        self.root = KeyLevel(table or {}, 3)
+        self._lookup = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._resolve)
+
+    def _resolve(self, car: str, model: str, detail: str) -> Tuple[str, ...]:
+        car_key = self.root.best_key(car)
+        if not car_key:
+            return ()
+        models = self.root.children[car_key]
+        model_key = models.best_key(model)
+        if not model_key:
+            return ()
+        details = models.children[model_key]
+        detail_key = details.best_key(detail)
+        if not detail_key:
+            return ()
+        return tuple(details.mapping.get(detail_key, []))
+
+    def lookup(self, car: str, model: str, detail: str) -> List[str]:
+        return list(self._lookup(car, model, detail))
+
+    def cache_info(self):
+        return self._lookup.cache_info()
+
+
+LOOKUP_INDEX = LookupIndex(LOOKUP_DATA)
+CATALOG_INDEX = LookupIndex(CATALOG_DATA)
+
+
+KEYWORD_FUZZY_THRESHOLD = 85
+
+
+class KeywordIndex:
+    # Compiled once from KEYWORD_OEM_MAP: exact keyword hits come from a single
+    # automaton pass over the query, and only the keywords that did not occur
+    # verbatim are fuzzy-scored, in one batched RapidFuzz call.
+
+    def __init__(self, keyword_map: Dict[str, List[str]]) -> None:
+        self.keywords = list(keyword_map)
+        self.oems = [keyword_map[keyword] for keyword in self.keywords]
+        self.automaton = AhoCorasick(self.keywords)
+
+    def match(self, query: str) -> List[int]:
+        normalized_query = normalize(query)
+        matched = set(self.automaton.find_ids(normalized_query))
+        remaining = {index: keyword for index, keyword in enumerate(self.keywords) if index not in matched}
+        # partial_ratio is symmetric, so the query is preprocessed once and
+        # scored against every remaining keyword
+        for _, score, index in process.extract(
+            normalized_query,
+            remaining,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=KEYWORD_FUZZY_THRESHOLD,
+            limit=None,
+        ):
+            if score > KEYWORD_FUZZY_THRESHOLD:
+                matched.add(index)
+        # map order, so candidates keep the order the old per-keyword loop gave
+        return sorted(matched)
+
+
+KEYWORD_INDEX = KeywordIndex(KEYWORD_OEM_MAP)
+
+
 def keyword_oems(query: str) -> List[str]:
-    normalized_query = normalize(query)
     collected: List[str] = []
-    for keyword, oems in KEYWORD_OEM_MAP.items():
-        if keyword in normalized_query:
-            collected.extend(oems)
-        else:
-            ratio = fuzz.partial_ratio(keyword, normalized_query)
-            if ratio > 85:
-                collected.extend(oems)
+    for index in KEYWORD_INDEX.match(query):
+        collected.extend(KEYWORD_INDEX.oems[index])
     return collected
 
 
 def extract_oems_from_text(text: str) -> List[str]:
-    results = OEM_REGEX.findall(text)
-    for pattern in PREFIX_HINT_PATTERNS:
-        results.extend(pattern.findall(text))
-    cleaned: List[str] = []
-    for match in results:
-        if isinstance(match, tuple):
-            match = "".join(match)
-        cleaned.append(match)
-    return cleaned
-
-
-def scrape_rrr_for_keywords(keywords: List[str]) -> List[str]:
-    found: List[str] = []
-    for kw in keywords:
-        try:
-            response = requests.get(f"https://rrr.lt/paieska/?q={quote(kw)}", timeout=10)
-            response.raise_for_status()
-        except requests.RequestException:
-            continue
-        soup = BeautifulSoup(response.text, "lxml")
-        text_content = soup.get_text(" ", strip=True)
-        found.extend(extract_oems_from_text(text_content))
-        links = soup.find_all("a", href=True)
-        for link in links:
-            found.extend(extract_oems_from_text(link.get_text(" ", strip=True)))
-            found.extend(extract_oems_from_text(link.get("href", "")))
+    return extract_oems(text)
+
+
+_keyword_flights = SingleFlight()
+
+
+def keyword_page_oems(html: str) -> List[str]:
+    # OEMs on one rrr.lt search page, in page order. Link texts are already
+    # part of the page text, so only the hrefs need a second look.
+    root = parse_html(html)
+    if root is None:
+        return []
+    found = extract_oems(element_text(root))
+    for link in root.iter("a"):
+        found.extend(extract_oems(link.get("href") or ""))
+    return dedupe_preserve(found)
+
+
+async def _scrape_keyword(keyword: str, client: Optional[httpx.AsyncClient]) -> Optional[List[str]]:
+    # None when rrr.lt could not be asked; [] when it was and had nothing
+    url = f"{RRR_BASE_URL}/paieska/?q={quote(keyword)}"
+    response, _ = await governed_get(url, client=client)
+    if response is None:
+        return None
+    try:
+        found = await run_cpu(keyword_page_oems, response.text)
+    except (PoolSaturated, asyncio.TimeoutError):
+        return None
+    save_keyword_oems(keyword, found)
     return found
 
 
+async def scrape_rrr_for_keywords(
+    keywords: List[str], client: Optional[httpx.AsyncClient] = None, budget: float = KEYWORD_SCRAPE_BUDGET
+) -> List[str]:
+    # Keywords are searched concurrently (concurrent searches for the same
+    # keyword share one request) and their findings persisted, so the next
+    # query with the same words needs no scrape. Keywords still pending when
+    # the budget runs out are dropped.
+    found: Dict[str, List[str]] = {}
+    tasks: Dict[str, asyncio.Future] = {}
+    for keyword in dedupe_preserve(keywords):
+        cached = get_keyword_oems(keyword)
+        if cached is not None:
+            found[keyword] = cached
+        else:
+            tasks[keyword] = asyncio.ensure_future(
+                _keyword_flights.do(keyword, lambda keyword=keyword: _scrape_keyword(keyword, client))
+            )
+    if tasks:
+        _, pending = await asyncio.wait(tasks.values(), timeout=budget)
+        for task in pending:
+            task.cancel()
+        for keyword, task in tasks.items():
+            if task.done() and not task.cancelled() and task.exception() is None and task.result() is not None:
+                found[keyword] = task.result()
+    return dedupe_preserve([oem for keyword in keywords for oem in found.get(keyword, [])])
+
+
 def score_candidates(candidates: List[Tuple[str, int]]) -> List[str]:
     sorted_items = sorted(candidates, key=lambda item: item[1], reverse=True)
     ordered: List[str] = []
@@ -207,33 +339,136 @@ def score_candidates(candidates: List[Tuple[str, int]]) -> List[str]:
     return ordered
 
 
-def resolve_oem(car: str, model: str, detail: str, query: str) -> List[str]:
-    print("OEM resolver input:", car, model, detail, query)
+def score_static_sources(car: str, model: str, detail: str, query: str) -> List[Tuple[str, int]]:
+    # CPU-only part of the resolver (seeded tables, keyword fuzzing, regexes);
+    # safe to run in a worker pool since it touches no shared state
     scored: List[Tuple[str, int]] = []
 
     # catalog / lookup matches
-    for table, weight in ((LOOKUP_DATA, 90), (CATALOG_DATA, 88)):
-        for oem in lookup_from_table(car, model, detail, table):
+    for index, weight in ((LOOKUP_INDEX, 90), (CATALOG_INDEX, 88)):
+        for oem in index.lookup(car, model, detail):
             scored.append((oem.upper(), weight))
 
-    for oem in get_known_oems(car, model, detail, base_catalog=CATALOG_DATA):
-        scored.append((oem.upper(), 87))
-
     for oem in keyword_oems(query):
         scored.append((oem.upper(), 85))
 
-    normalized_query = normalize(query)
-    for detected in extract_oems_from_text(query + " " + normalized_query):
+    # the prefix hints used to be rescanned over the normalized query at a
+    # lower weight; extract_oems already reports them here
+    for detected in extract_oems(query + " " + normalize(query)):
         scored.append((detected.upper(), 95))
-
-    for pattern in PREFIX_HINT_PATTERNS:
-        for m in pattern.findall(normalized_query):
-            scored.append((m.upper(), 80))
+    return scored
+
+
+def score_known_oems(car: str, model: str, detail: str) -> List[Tuple[str, int]]:
+    return [(oem.upper(), 87) for oem in get_known_oems(car, model, detail, base_catalog=CATALOG_DATA)]
+
+
+ResolveKey = Tuple[str, str, str, str]
+
+
+class ResolveCache:
+    # LRU + TTL cache of resolve_oem_async results keyed by the normalized
+    # (car, model, detail, query). Entries are indexed by (car, model), the
+    # granularity at which a learned OEM changes get_known_oems.
+
+    def __init__(self, max_entries: int = RESOLVE_CACHE_SIZE, ttl: float = RESOLVE_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[ResolveKey, Tuple[float, Tuple[str, ...]]]" = OrderedDict()
+        self._slots: Dict[Tuple[str, str], Set[ResolveKey]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(car: str, model: str, detail: str, query: str) -> ResolveKey:
+        return normalize(car), normalize(model), normalize(detail), normalize(query)
+
+    def get(self, key: ResolveKey) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, key: ResolveKey, candidates: List[str]) -> None:
+        # empty results usually mean the fallback scrape failed; not kept
+        if not self.max_entries or not candidates:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, tuple(candidates))
+            self._entries.move_to_end(key)
+            self._slots.setdefault(key[:2], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: ResolveKey) -> None:
+        self._entries.pop(key, None)
+        slot = self._slots.get(key[:2])
+        if slot is not None:
+            slot.discard(key)
+            if not slot:
+                del self._slots[key[:2]]
+
+    def invalidate(self, car: str, model: str) -> int:
+        with self._lock:
+            keys = list(self._slots.get((normalize(car), normalize(model)), ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def on_new_oem(self, car: str, model: str, detail: str, oem: str) -> None:
+        self.invalidate(car, model)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._slots.clear()
+
+    def cache_info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_size": self.max_entries,
+            }
+
+
+RESOLVE_CACHE = ResolveCache()
+add_oem_listener(RESOLVE_CACHE.on_new_oem)
+
+
+def fallback_keywords(query: str) -> List[str]:
+    return [kw for kw in normalize(query).split() if kw not in STOPWORDS and len(kw) > 2][:3]
+
+
+async def resolve_oem_async(car: str, model: str, detail: str, query: str) -> List[str]:
+    # candidate OEMs for a query, best first; the scoring runs on the worker
+    # pool and the fallback scrape on the app's shared HTTP client, so the
+    # event loop is never held
+    print("OEM resolver input:", car, model, detail, query)
+    key = ResolveCache.key(car, model, detail, query)
+    cached = RESOLVE_CACHE.get(key)
+    if cached is not None:
+        print("Cached OEM candidates:", cached)
+        return cached
+    scored = await run_cpu(score_static_sources, car, model, detail, query)
+    scored.extend(score_known_oems(car, model, detail))
 
     if not scored:
-        keywords = [kw for kw in normalized_query.split() if kw not in STOPWORDS and len(kw) > 2][:3]
-        scored.extend([(cand.upper(), 70) for cand in scrape_rrr_for_keywords(keywords)])
+        found = await scrape_rrr_for_keywords(fallback_keywords(query))
+        scored.extend([(cand.upper(), 70) for cand in found])
 
     final_candidates = score_candidates(scored)
     print("Detected OEM candidates:", final_candidates)
+    RESOLVE_CACHE.put(key, final_candidates)
     return final_candidates
@@ -0,0 +1,144 @@
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# quote = robust aggregate of the offers × markup
+PRICE_MARKUP = float(os.getenv("PRICE_MARKUP", "1.35"))
+# "iqr" (mean after Tukey fences), "trimmed" (mean without the tails),
+# "median", or "mean" (every offer, the original behaviour)
+PRICE_METHOD = os.getenv("PRICE_METHOD", "iqr")
+IQR_FACTOR = float(os.getenv("PRICE_IQR_FACTOR", "1.5"))
+TRIM_FRACTION = float(os.getenv("PRICE_TRIM_FRACTION", "0.1"))
+METHODS = ("iqr", "trimmed", "median", "mean")
+
+# relative trust in each marketplace; offers without a source weigh 1
+SOURCE_WEIGHTS: Dict[str, float] = {"rrr": 1.0, "ebay": 1.0}
+SOURCE_WEIGHTS.update(json.loads(os.getenv("PRICE_SOURCE_WEIGHTS", "{}")))
+
+# units of BASE_CURRENCY per unit of each currency; both marketplaces quote EUR
+BASE_CURRENCY = "EUR"
+CURRENCY_RATES: Dict[str, float] = {"EUR": 1.0}
+CURRENCY_RATES.update(json.loads(os.getenv("PRICE_CURRENCY_RATES", "{}")))
+
+
+def _quantile(values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    # linear-interpolated quantile of each group in a (group, value)-sorted array
+    h = (np.maximum(counts, 1) - 1) * q
+    lo = np.floor(h).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(counts, 1) - 1)
+    if not len(values):
+        return np.full(len(counts), np.nan)
+    first = np.minimum(starts + lo, len(values) - 1)
+    last = np.minimum(starts + hi, len(values) - 1)
+    result = values[first] + (h - lo) * (values[last] - values[first])
+    return np.where(counts > 0, result, np.nan)
+
+
+def _first_index(mask: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # index of the first True per group (groups are contiguous and start at starts)
+    positions = np.where(mask, np.arange(len(mask)), len(mask))
+    first = np.full(len(counts), len(mask))
+    nonempty = counts > 0
+    if len(mask):
+        first[nonempty] = np.minimum.reduceat(positions, starts[nonempty])
+    return first
+
+
+def aggregate(
+    values: np.ndarray,
+    groups: np.ndarray,
+    n_groups: int,
+    weights: Optional[np.ndarray] = None,
+    method: str = PRICE_METHOD,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Robust price of every group at once from flat arrays: values[i] belongs
+    # to group groups[i]. Returns (price per group, offers used per group);
+    # groups without a usable offer get NaN.
+    if method not in METHODS:
+        raise ValueError(f"Unknown pricing method: {method}")
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups, dtype=np.int64)
+    weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    # non-positive or missing prices are parse failures, not offers
+    usable = np.isfinite(values) & (values > 0) & np.isfinite(weights) & (weights > 0)
+    values, groups, weights = values[usable], groups[usable], weights[usable]
+    # equal prices are ordered by weight so trimming a tie is deterministic
+    order = np.lexsort((weights, values, groups))
+    values, groups, weights = values[order], groups[order], weights[order]
+
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    position = np.arange(len(values)) - starts[groups]
+
+    if method == "median":
+        # weighted median; with equal weights this is the usual median
+        cumulative = np.cumsum(weights)
+        cumulative -= np.repeat(np.concatenate(([0.0], cumulative))[starts], counts)
+        half = np.bincount(groups, weights, minlength=n_groups)[groups] / 2
+        lower = _first_index(cumulative >= half - 1e-9 * half, starts, counts)
+        upper = _first_index(cumulative > half + 1e-9 * half, starts, counts)
+        nonempty = counts > 0
+        price = np.full(n_groups, np.nan)
+        price[nonempty] = (values[lower[nonempty]] + values[upper[nonempty]]) / 2
+        return price, counts
+
+    if method == "iqr":
+        q1 = _quantile(values, starts, counts, 0.25)
+        q3 = _quantile(values, starts, counts, 0.75)
+        spread = IQR_FACTOR * (q3 - q1)
+        keep = (values >= (q1 - spread)[groups]) & (values <= (q3 + spread)[groups])
+    elif method == "trimmed":
+        cut = np.floor(counts * TRIM_FRACTION).astype(np.int64)
+        keep = (position >= cut[groups]) & (position < (counts - cut)[groups])
+    else:
+        keep = np.ones(len(values), dtype=bool)
+
+    kept_weights = weights * keep
+    total = np.bincount(groups, kept_weights, minlength=n_groups)
+    weighted = np.bincount(groups, kept_weights * values, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        price = np.where(total > 0, weighted / total, np.nan)
+    return price, np.bincount(groups, keep, minlength=n_groups)
+
+
+def aggregate_groups(
+    groups: Sequence[Sequence[float]],
+    weights: Optional[Sequence[Sequence[float]]] = None,
+    method: str = PRICE_METHOD,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # aggregate() for a list of price lists, e.g. one per OEM
+    lengths = np.fromiter((len(group) for group in groups), dtype=np.int64, count=len(groups))
+    ids = np.repeat(np.arange(len(groups)), lengths)
+    flat = np.fromiter((price for group in groups for price in group), dtype=np.float64, count=int(lengths.sum()))
+    flat_weights = None
+    if weights is not None:
+        flat_weights = np.fromiter((w for group in weights for w in group), dtype=np.float64, count=len(flat))
+    return aggregate(flat, ids, len(groups), flat_weights, method)
+
+
+def offer_inputs(offers: List[Dict]) -> Tuple[List[float], List[float]]:
+    # prices in BASE_CURRENCY and source weights; unknown currencies are dropped
+    prices: List[float] = []
+    weights: List[float] = []
+    for offer in offers:
+        price = offer.get("price")
+        rate = CURRENCY_RATES.get(offer.get("currency") or BASE_CURRENCY)
+        if not isinstance(price, (int, float)) or rate is None:
+            continue
+        prices.append(price * rate)
+        weights.append(SOURCE_WEIGHTS.get(offer.get("source"), 1.0))
+    return prices, weights
+
+
+def quote_offers(offers_per_part: List[List[Dict]], method: str = PRICE_METHOD) -> List[Optional[float]]:
+    # final (marked-up) price for each list of offers, or None without usable offers
+    inputs = [offer_inputs(offers) for offers in offers_per_part]
+    price, _ = aggregate_groups([p for p, _ in inputs], [w for _, w in inputs], method)
+    return [round(float(value) * PRICE_MARKUP, 2) if np.isfinite(value) else None for value in price]
+
+
+def quote_price(offers: List[Dict], method: str = PRICE_METHOD) -> Optional[float]:
+    return quote_offers([offers], method)[0]
@@ -0,0 +1,230 @@
+import asyncio
+import csv
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from file_lock import file_lock
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pa_csv
+except ImportError:  # optional: rotated segments stay CSV without it
+    pa = None
+
+LOG_PATH = os.getenv("PART_LOG_PATH", os.path.join("data", "part_logs.csv"))
+# rows are written in batches, at least this often
+LOG_FLUSH_SECONDS = float(os.getenv("PART_LOG_FLUSH_SECONDS", "1"))
+LOG_BATCH_SIZE = int(os.getenv("PART_LOG_BATCH_SIZE", "200"))
+# rows held in memory when the disk cannot keep up; the oldest are dropped
+LOG_BUFFER_MAX = int(os.getenv("PART_LOG_BUFFER_MAX", "50000"))
+# the active file is rotated into a timestamped segment once it reaches this
+# size, or this age when set (0 disables time-based rotation)
+LOG_ROTATE_BYTES = int(os.getenv("PART_LOG_ROTATE_BYTES", str(64 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = float(os.getenv("PART_LOG_ROTATE_SECONDS", "0"))
+# convert rotated segments to Parquet (needs pyarrow)
+LOG_PARQUET = os.getenv("PART_LOG_PARQUET", "0") == "1"
+
+LOG_HEADER = ["timestamp", "part_number", "min_price", "max_price", "avg_price", "final_price", "count"]
+
+LogEntry = Tuple[str, List[float], float]
+
+
+def log_row(part_number: str, prices: List[float], final_price: float) -> List:
+    # timestamped when the request is served, not when the batch is written
+    timestamp = datetime.utcnow().isoformat()
+    min_price = min(prices) if prices else None
+    max_price = max(prices) if prices else None
+    avg_price = sum(prices) / len(prices) if prices else None
+    return [timestamp, part_number, min_price, max_price, avg_price, final_price, len(prices)]
+
+
+def segment_paths(path: str = LOG_PATH) -> List[str]:
+    # rotated segments, oldest first
+    directory, name = os.path.split(path)
+    base, _ = os.path.splitext(name)
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        return []
+    segments = [n for n in names if n.startswith(f"{base}-") and n.endswith((".csv", ".parquet"))]
+    return [os.path.join(directory, n) for n in sorted(segments)]
+
+
+class RequestLog:
+    # In-memory queue of log rows drained by one flusher task per process.
+    # Batches are appended under an exclusive lock on a side file, so several
+    # uvicorn workers can share the log and its rotation.
+
+    def __init__(
+        self,
+        path: str = LOG_PATH,
+        flush_seconds: float = LOG_FLUSH_SECONDS,
+        batch_size: int = LOG_BATCH_SIZE,
+        rotate_bytes: int = LOG_ROTATE_BYTES,
+        rotate_seconds: float = LOG_ROTATE_SECONDS,
+        parquet: bool = LOG_PARQUET,
+    ) -> None:
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.flush_seconds = flush_seconds
+        self.batch_size = max(1, batch_size)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.parquet = parquet and pa is not None
+        self._pending: List[List] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def log_many(self, entries: List[LogEntry]) -> None:
+        rows = [log_row(*entry) for entry in entries]
+        if not rows:
+            return
+        with self._pending_lock:
+            self._pending.extend(rows)
+            dropped = len(self._pending) - LOG_BUFFER_MAX
+            if dropped > 0:
+                del self._pending[:dropped]
+                print(f"Request log buffer full, dropped {dropped} rows")
+            pending = len(self._pending)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # no event loop (scripts, CLI): write straight away
+            self.flush()
+            return
+        self._ensure_flusher()
+        if pending >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def log(self, part_number: str, prices: List[float], final_price: float) -> None:
+        self.log_many([(part_number, prices, final_price)])
+
+    def _ensure_flusher(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except OSError as error:
+                print("Request log flush failed:", error)
+
+    async def close(self) -> None:
+        # the flusher is stopped rather than cancelled, so a batch being
+        # written is never cut short
+        if self._task is not None and self._wakeup is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await asyncio.to_thread(self.flush)
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        rotated: Optional[str] = None
+        with self._write_lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with file_lock(self.lock_path):
+                if self._should_rotate():
+                    rotated = self._rotate()
+                file_exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+                with open(self.path, "a", newline="", encoding="utf-8") as csvfile:
+                    writer = csv.writer(csvfile)
+                    if not file_exists:
+                        writer.writerow(LOG_HEADER)
+                    writer.writerows(rows)
+        # the segment now has a unique name, so converting it needs no lock
+        if rotated and self.parquet:
+            self._convert(rotated)
+
+    def _started_at(self) -> Optional[datetime]:
+        # timestamp of the first row in the active file
+        try:
+            with open(self.path, "r", newline="", encoding="utf-8") as csvfile:
+                reader = csv.reader(csvfile)
+                next(reader, None)
+                first = next(reader, None)
+            return datetime.fromisoformat(first[0]) if first else None
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _should_rotate(self) -> bool:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if self.rotate_bytes and size >= self.rotate_bytes:
+            return True
+        if self.rotate_seconds:
+            started = self._started_at()
+            return started is not None and (datetime.utcnow() - started).total_seconds() >= self.rotate_seconds
+        return False
+
+    def _rotate(self) -> str:
+        base, ext = os.path.splitext(self.path)
+        segment = f"{base}-{datetime.utcnow():%Y%m%dT%H%M%S%f}{ext}"
+        os.replace(self.path, segment)
+        return segment
+
+    def _convert(self, segment: str) -> None:
+        try:
+            table = pa_csv.read_csv(
+                segment,
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={
+                        "timestamp": pa.timestamp("us"),
+                        "part_number": pa.string(),
+                        "min_price": pa.float64(),
+                        "max_price": pa.float64(),
+                        "avg_price": pa.float64(),
+                        "final_price": pa.float64(),
+                        "count": pa.int64(),
+                    }
+                ),
+            )
+            target = os.path.splitext(segment)[0] + ".parquet"
+            pq.write_table(table, target + ".tmp")
+            os.replace(target + ".tmp", target)
+            os.remove(segment)
+        except (OSError, pa.ArrowException) as error:
+            print(f"Keeping {segment} as CSV, Parquet conversion failed: {error}")
+
+
+_request_log: Optional[RequestLog] = None
+
+
+def get_request_log() -> RequestLog:
+    global _request_log
+    if _request_log is None:
+        _request_log = RequestLog()
+    return _request_log
+
+
+def log_request(part_number: str, prices: List[float], final_price: float) -> None:
+    get_request_log().log(part_number, prices, final_price)
+
+
+def log_requests(entries: List[LogEntry]) -> None:
+    get_request_log().log_many(entries)
+
+
+async def close_request_log() -> None:
+    if _request_log is not None:
+        await _request_log.close()
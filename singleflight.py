@@ -0,0 +1,84 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    # Coalesces concurrent calls sharing a key into one in-flight task whose
+    # result every caller receives. A caller being cancelled does not cancel
+    # the shared work unless it was the last one still waiting for it.
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters[task] == 1:
+                # callers arriving from now on start a fresh flight instead
+                # of joining one that is being cancelled
+                self._forget(key, task)
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+
+# receives the arguments of every published event
+Listener = Callable[..., None]
+
+
+class Broadcast:
+    # Fans the progress events of coalesced work out to every caller waiting
+    # for it. A caller that joins late first receives the events sent so far.
+
+    def __init__(self) -> None:
+        self._sent: Dict[Hashable, List[Tuple]] = {}
+        self._listeners: Dict[Hashable, List[Listener]] = {}
+
+    def subscribe(self, key: Hashable, listener: Listener) -> None:
+        for args in self._sent.get(key, []):
+            listener(*args)
+        self._listeners.setdefault(key, []).append(listener)
+
+    def unsubscribe(self, key: Hashable, listener: Listener) -> None:
+        listeners = self._listeners.get(key, [])
+        if listener in listeners:
+            listeners.remove(listener)
+        if not listeners:
+            self._listeners.pop(key, None)
+
+    async def run(self, key: Hashable, start: Callable[[Listener], Awaitable[T]]) -> T:
+        # start(publish) does the work; what it publishes reaches the current
+        # and later subscribers of key until it finishes
+        sent: List[Tuple] = []
+        self._sent[key] = sent
+
+        def publish(*args) -> None:
+            sent.append(args)
+            for listener in list(self._listeners.get(key, [])):
+                listener(*args)
+
+        try:
+            return await start(publish)
+        finally:
+            if self._sent.get(key) is sent:
+                del self._sent[key]
@@ -1,4 +1,5 @@
 let carsData = {};
+let activeStream = null;
 
 async function fetchJson(url) {
     const response = await fetch(url);
@@ -20,6 +21,62 @@ function renderResult(data) {
     resultDiv.innerHTML = `${imageHtml}<h2>${priceText}</h2>`;
 }
 
+function renderProgress(offers, status) {
+    const resultDiv = document.getElementById('result');
+    const prices = offers.map((offer) => offer.price).filter((price) => typeof price === 'number');
+    const photo = offers.map((offer) => offer.image).find((image) => image);
+    const imageHtml = photo ? `<img src="${photo}" alt="Part photo">` : '';
+    const priceText = prices.length
+        ? `${prices.length} offers so far, from ${Math.min(...prices)} €`
+        : 'Searching...';
+    resultDiv.innerHTML = `${imageHtml}<h2>${priceText}</h2><p>${status}</p>`;
+}
+
+async function fetchPart(query) {
+    try {
+        const data = await fetchJson(`/api/part?q=${encodeURIComponent(query)}`);
+        renderResult(data);
+    } catch (error) {
+        renderResult({ error: 'Failed to fetch offers.' });
+    }
+}
+
+function streamPart(query) {
+    // offers are shown as soon as the cache or any marketplace answers; the
+    // final price replaces them when the search completes
+    if (activeStream) {
+        activeStream.close();
+    }
+    const source = new EventSource(`/api/part/stream?q=${encodeURIComponent(query)}`);
+    activeStream = source;
+    const offers = [];
+    let finished = false;
+
+    source.addEventListener('candidates', (event) => {
+        const data = JSON.parse(event.data);
+        const count = data.oem_candidates.length;
+        renderProgress(offers, count ? `Checking ${count} OEM candidates...` : 'Searching by text...');
+    });
+    const addOffers = (label) => (event) => {
+        const data = JSON.parse(event.data);
+        offers.push(...data.offers);
+        renderProgress(offers, `${label(data)} answered, waiting for the rest...`);
+    };
+    source.addEventListener('cache', addOffers((data) => `Cached offers for ${data.oem}`));
+    source.addEventListener('listings', addOffers((data) => (data.source === 'ebay' ? 'eBay' : 'rrr.lt')));
+    source.addEventListener('result', (event) => {
+        finished = true;
+        source.close();
+        renderResult(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+        source.close();
+        if (!finished && activeStream === source) {
+            fetchPart(query);
+        }
+    };
+}
+
 async function searchPart() {
     const input = document.getElementById('oem');
     const query = input.value.trim();
@@ -31,11 +88,10 @@ async function searchPart() {
     const resultDiv = document.getElementById('result');
     resultDiv.innerHTML = '<p>Loading...</p>';
 
-    try {
-        const data = await fetchJson(`/api/part?q=${encodeURIComponent(query)}`);
-        renderResult(data);
-    } catch (error) {
-        renderResult({ error: 'Failed to fetch offers.' });
+    if (window.EventSource) {
+        streamPart(query);
+    } else {
+        await fetchPart(query);
     }
 }
 
@@ -0,0 +1,103 @@
+import asyncio
+import random
+from typing import List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, Response
+
+from fixture_store import SITES, FixtureStore
+
+THROTTLE_PAGE = "<html><body><h1>DDOS protection</h1><p>Checking your browser...</p></body></html>"
+EMPTY_PAGE = "<html><body><p>No results</p></body></html>"
+
+
+class Faults:
+    # latency (seconds, mean and uniform jitter) and the share of requests
+    # answered with a 500, a 429 or a 200 "DDOS" challenge page
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        ddos_rate: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.ddos_rate = ddos_rate
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def fault(self) -> str:
+        roll = random.random()
+        for name, rate in (("error", self.error_rate), ("throttle", self.throttle_rate), ("ddos", self.ddos_rate)):
+            if roll < rate:
+                return name
+            roll -= rate
+        return ""
+
+
+def create_app(store: FixtureStore, site: str, own_base: str, faults: Faults) -> FastAPI:
+    # Replays one marketplace. Links to the recorded site are rewritten to
+    # point back at the stub, so detail pages are fetched from it too.
+    app = FastAPI(title=f"Stub {site}")
+    recorded_base = store.bases.get(site, SITES[site])
+
+    @app.get("/{path:path}")
+    async def replay(request: Request, path: str) -> Response:
+        await asyncio.sleep(faults.delay())
+        fault = faults.fault()
+        if fault:
+            if fault == "error":
+                return HTMLResponse("Internal Server Error", status_code=500)
+            if fault == "throttle":
+                return HTMLResponse("Too Many Requests", status_code=429, headers={"Retry-After": "1"})
+            return HTMLResponse(THROTTLE_PAGE)
+
+        target = request.scope["raw_path"].decode("ascii")
+        if request.scope["query_string"]:
+            target += "?" + request.scope["query_string"].decode("ascii")
+        fixture = store.get(site, target)
+        if fixture is None:
+            return HTMLResponse(EMPTY_PAGE, status_code=404)
+        status, content_type, body = fixture
+        return Response(body.replace(recorded_base, own_base), status_code=status, media_type=content_type)
+
+    return app
+
+
+async def serve(store: FixtureStore, host: str, ports: List[int], faults: Faults) -> None:
+    servers = []
+    for site, port in zip(SITES, ports):
+        own_base = f"http://{host}:{port}"
+        app = create_app(store, site, own_base, faults)
+        servers.append(uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning")))
+        print(f"Stub {site} on {own_base}: set {site.upper()}_BASE_URL={own_base}")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay recorded marketplace responses")
+    parser.add_argument("fixtures", help="JSONL file written with HTTP_RECORD_PATH")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8801, help="rrr.lt stub; eBay listens on the next port")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--ddos-rate", type=float, default=0.0, help="share of DDOS challenge pages")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    fixture_store = FixtureStore(args.fixtures).load()
+    print(f"Loaded {len(fixture_store.fixtures)} recorded responses from {args.fixtures}")
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.ddos_rate)
+    asyncio.run(serve(fixture_store, args.host, [args.port, args.port + 1], faults))
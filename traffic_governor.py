@@ -0,0 +1,187 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from http_client import conditional_get
+from listing_parser import EBAY_BASE_URL, RRR_BASE_URL
+
+
+def _host(url_or_host: str) -> str:
+    if "://" not in url_or_host:
+        return url_or_host
+    parts = urlsplit(url_or_host)
+    # the port keeps stub marketplaces running on one machine apart
+    return f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname or ""
+
+
+# requests per second and burst size per host
+HOST_LIMITS: Dict[str, Tuple[float, int]] = {
+    _host(RRR_BASE_URL): (float(os.getenv("RRR_RATE_LIMIT", "4")), 8),
+    _host(EBAY_BASE_URL): (float(os.getenv("EBAY_RATE_LIMIT", "6")), 12),
+}
+DEFAULT_LIMIT: Tuple[float, int] = (5.0, 10)
+
+# a request that would have to queue longer than this fails fast instead
+MAX_QUEUE_WAIT = float(os.getenv("OUTBOUND_MAX_QUEUE_WAIT", "5"))
+# consecutive failures that trip the breaker, and how long it stays open
+FAILURE_THRESHOLD = int(os.getenv("OUTBOUND_FAILURE_THRESHOLD", "5"))
+OPEN_SECONDS = float(os.getenv("OUTBOUND_OPEN_SECONDS", "30"))
+# throttling responses slow a host down by up to this factor
+MAX_PENALTY = 16.0
+BASE_RETRY_DELAY = 0.5
+
+
+def is_throttled(status_code: int, text: str) -> bool:
+    return status_code in (429, 503) or "DDOS" in text
+
+
+class HostGovernor:
+    # Token-bucket rate limit, adaptive slow-down and circuit breaker for one
+    # host, shared by every scraper that requests pages from it.
+
+    def __init__(self, host: str, rate: float, burst: int) -> None:
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.penalty = 1.0
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # task sending the half-open probe, and when it was let through
+        self.probe_owner: Optional[object] = None
+        self.probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < OPEN_SECONDS
+
+    def _probing(self, now: float) -> bool:
+        # a probe that never reported back (e.g. lost with its process) is
+        # given up on after OPEN_SECONDS
+        return self.probe_owner is not None and now - self.probe_started < OPEN_SECONDS
+
+    def _admit(self, owner: object) -> Optional[float]:
+        # returns the delay before the request may be sent, or None to fail fast
+        with self._lock:
+            now = time.monotonic()
+            probe = False
+            if self.opened_at is not None:
+                if now - self.opened_at < OPEN_SECONDS or self._probing(now):
+                    return None
+                # half-open: let a single probe through
+                probe = True
+            rate = self.rate / self.penalty
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / rate
+            if wait > MAX_QUEUE_WAIT:
+                return None
+            self.tokens -= 1
+            if probe:
+                self.probe_owner = owner
+                self.probe_started = now
+            return wait
+
+    async def acquire(self) -> bool:
+        wait = self._admit(asyncio.current_task())
+        if wait is None:
+            return False
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+        return True
+
+    def release(self) -> None:
+        # The caller gave up on its request without an answer (cancelled). If
+        # it was the half-open probe, the next request probes instead.
+        owner = asyncio.current_task()
+        with self._lock:
+            if owner is not None and self.probe_owner is owner:
+                self.probe_owner = None
+
+    def retry_delay(self, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_QUEUE_WAIT)
+        with self._lock:
+            penalty = self.penalty
+        return BASE_RETRY_DELAY * penalty * random.uniform(1.0, 2.6)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_owner = None
+            self.penalty = max(1.0, self.penalty * 0.8)
+
+    def record_failure(self, throttled: bool = False) -> None:
+        with self._lock:
+            self.failures += 1
+            if throttled:
+                self.penalty = min(MAX_PENALTY, self.penalty * 2)
+            probing = self._probing(time.monotonic())
+            if probing or self.failures >= FAILURE_THRESHOLD:
+                if self.opened_at is None or probing:
+                    print(f"Circuit opened for {self.host} after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self.probe_owner = None
+
+
+_governors: Dict[str, HostGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(url_or_host: str) -> HostGovernor:
+    host = _host(url_or_host)
+    with _governors_lock:
+        governor = _governors.get(host)
+        if governor is None:
+            rate, burst = HOST_LIMITS.get(host, DEFAULT_LIMIT)
+            governor = _governors[host] = HostGovernor(host, rate, burst)
+        return governor
+
+
+def any_tripped() -> bool:
+    return any(governor.is_open for governor in list(_governors.values()))
+
+
+async def governed_get(
+    url: str, headers: Optional[Dict[str, str]] = None, client: Optional[httpx.AsyncClient] = None
+) -> Tuple[Optional[httpx.Response], Optional[float]]:
+    # One GET through the host's governor, with the outcome recorded. Returns
+    # the response when the host answered without an error; otherwise None
+    # and how long to wait before retrying, or None for the delay when the
+    # governor turned the request away (circuit open or queue full).
+    governor = get_governor(url)
+    if not await governor.acquire():
+        return None, None
+    try:
+        response = await conditional_get(url, headers, client)
+    except asyncio.CancelledError:
+        # a cancelled half-open probe must not keep the host blocked
+        governor.release()
+        raise
+    except httpx.HTTPError:
+        governor.record_failure()
+        return None, governor.retry_delay()
+    if is_throttled(response.status_code, response.text):
+        governor.record_failure(throttled=True)
+        return None, governor.retry_delay(response.headers.get("Retry-After"))
+    if response.status_code >= 500:
+        governor.record_failure()
+        return None, governor.retry_delay()
+    governor.record_success()
+    if response.is_error:
+        return None, governor.retry_delay()
+    return response, None
@@ -0,0 +1,99 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from text_matchers import AhoCorasick
+
+CarsData = Dict[str, Dict[str, Dict[str, List[str]]]]
+
+
+class VehicleIndex:
+    # cars.json compiled into one automaton over every normalized make, model
+    # and part name. A query is scanned once; each level then picks, among the
+    # names found, the one that comes first in file order, which is what the
+    # nested "first substring hit" loops returned.
+
+    def __init__(self, data: CarsData, normalize: Callable[[str], str]) -> None:
+        self.data = data if isinstance(data, dict) else {}
+        self.normalize = normalize
+        self._pattern_ids: Dict[str, int] = {}
+        # pattern id -> rank of the first name with that normalized form
+        self.cars: Dict[int, int] = {}
+        self.car_keys: List[str] = []
+        self.models: Dict[str, Tuple[Dict[int, int], List[str]]] = {}
+        self.parts: Dict[Tuple[str, str], Tuple[Dict[int, int], List[str]]] = {}
+
+        for car, models in self.data.items():
+            self._rank(self.cars, self.car_keys, car)
+            model_ranks: Dict[int, int] = {}
+            model_keys: List[str] = []
+            for model, systems in (models if isinstance(models, dict) else {}).items():
+                self._rank(model_ranks, model_keys, model)
+                part_ranks: Dict[int, int] = {}
+                part_keys: List[str] = []
+                for part_list in (systems if isinstance(systems, dict) else {}).values():
+                    for part in part_list:
+                        self._rank(part_ranks, part_keys, part)
+                self.parts[(car, model)] = (part_ranks, part_keys)
+            self.models[car] = (model_ranks, model_keys)
+
+        patterns = [""] * len(self._pattern_ids)
+        for pattern, pattern_id in self._pattern_ids.items():
+            patterns[pattern_id] = pattern
+        self.automaton = AhoCorasick(patterns)
+
+    def _rank(self, ranks: Dict[int, int], keys: List[str], name: str) -> None:
+        normalized = self.normalize(name)
+        pattern_id = self._pattern_ids.setdefault(normalized, len(self._pattern_ids))
+        ranks.setdefault(pattern_id, len(keys))
+        keys.append(name)
+
+    @staticmethod
+    def _first(found: List[int], ranks: Dict[int, int], keys: List[str]) -> str:
+        best: Optional[int] = None
+        for pattern_id in found:
+            rank = ranks.get(pattern_id)
+            if rank is not None and (best is None or rank < best):
+                best = rank
+        return keys[best] if best is not None else ""
+
+    def parse(self, query: str) -> Tuple[str, str, str]:
+        found = self.automaton.find_ids(self.normalize(query))
+        car = self._first(found, self.cars, self.car_keys)
+        if not car:
+            return "", "", ""
+        model = self._first(found, *self.models[car])
+        if not model:
+            return car, "", ""
+        return car, model, self._first(found, *self.parts[(car, model)])
+
+
+class ReloadingVehicleIndex:
+    # Rebuilds the index when the file's mtime or size changes, so edits to
+    # cars.json are picked up without a restart.
+
+    def __init__(self, path: str, normalize: Callable[[str], str], loader: Callable[[str], CarsData]) -> None:
+        self.path = path
+        self.normalize = normalize
+        self.loader = loader
+        self._signature: Optional[Tuple[int, int]] = None
+        self._index = VehicleIndex({}, normalize)
+        self._lock = threading.Lock()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> VehicleIndex:
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return self._index
+        with self._lock:
+            if signature != self._signature:
+                self._index = VehicleIndex(self.loader(self.path), self.normalize)
+                self._signature = signature
+                print(f"Loaded vehicle index from {self.path}: {len(self._index.car_keys)} makes")
+        return self._index
@@ -0,0 +1,100 @@
+import asyncio
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# "thread" suits lxml and RapidFuzz, which release the GIL for most of their
+# work; "process" isolates pure-Python work entirely at the cost of pickling
+POOL_KIND = os.getenv("WORKER_POOL_KIND", "thread")
+POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", str(min(8, (os.cpu_count() or 1) + 2))))
+# tasks allowed to wait for a worker on top of the ones running
+POOL_QUEUE_DEPTH = int(os.getenv("WORKER_POOL_QUEUE", "64"))
+# how long a caller waits for a queue slot before the pool reports saturation
+POOL_QUEUE_WAIT = float(os.getenv("WORKER_POOL_QUEUE_WAIT", "2"))
+TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT", "5"))
+
+
+class PoolSaturated(RuntimeError):
+    pass
+
+
+def _release(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore) -> None:
+    try:
+        loop.call_soon_threadsafe(slots.release)
+    except RuntimeError:
+        # the event loop is already closed
+        pass
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        kind: str = POOL_KIND,
+        max_workers: int = POOL_SIZE,
+        queue_depth: int = POOL_QUEUE_DEPTH,
+        queue_wait: float = POOL_QUEUE_WAIT,
+        task_timeout: float = TASK_TIMEOUT,
+    ) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.queue_wait = queue_wait
+        self.task_timeout = task_timeout
+        self._capacity = self.max_workers + max(0, queue_depth)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpu-worker")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args, timeout: Optional[float] = None) -> T:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._capacity)
+        slots = self._slots
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_wait)
+        except asyncio.TimeoutError:
+            raise PoolSaturated(f"{self._capacity} tasks already queued or running") from None
+
+        loop = asyncio.get_running_loop()
+        future: Future = self._get_executor().submit(partial(func, *args))
+        # the slot is held until the work really finishes, even if the caller
+        # has timed out, so abandoned tasks still count towards the queue depth
+        future.add_done_callback(lambda _: _release(loop, slots))
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout or self.task_timeout)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._slots = None
+
+
+_pool: Optional[WorkerPool] = None
+
+
+def get_pool() -> WorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool()
+    return _pool
+
+
+async def run_cpu(func: Callable[..., T], *args, timeout: Optional[float] = None) -> T:
+    return await get_pool().run(func, *args, timeout=timeout)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = None